@@ -1,5 +1,7 @@
 from django.conf import urls
 
+from .batch import BatchResource
+
 
 class BaseApi(object):
 
@@ -12,6 +14,12 @@ class BaseApi(object):
         self._resources.update(resources)
         return self
 
+    def get_resources(self):
+        """
+        {name: resource}
+        """
+        return self._resources
+
     def get_resource_urls(self, name, resource):
         pass
 
@@ -29,6 +37,26 @@ class Api(BaseApi):
     element_url_tmpl = r'^{version}/{name}/(?P<identity>[\w\d-]+?)/?$'
     list_name_tmpl = 'api_{version}_{name}_list'
     element_name_tmpl = 'api_{version}_{name}_element'
+    batch_url_tmpl = r'^{version}/batch/?$'
+    batch_name_tmpl = 'api_{version}_batch'
+
+    def __init__(self, version, batch=False):
+        """
+        :param batch: serve batch.BatchResource at `{version}/batch`
+        """
+        super(Api, self).__init__(version)
+        self.batch = batch
+
+    @property
+    def urls(self):
+        url_list = super(Api, self).urls
+        if self.batch:
+            url_list += urls.patterns('', urls.url(
+                self.batch_url_tmpl.format(version=self.version),
+                BatchResource(self),
+                name=self.batch_name_tmpl.format(version=self.version)
+            ))
+        return url_list
 
     def get_resource_urls(self, name, resource):
         url_list = urls.patterns('')
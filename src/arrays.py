@@ -0,0 +1,61 @@
+"""
+Bulk conversion of numeric arrays used by array fields of forms and
+preparers and by the JSON encoder.
+
+Arrays can be produced as lists (default), array.array ('array') or NumPy
+arrays ('numpy'). Without NumPy installed 'numpy' gives array.array.
+"""
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CONVERTERS = {
+    'l': int,
+    'd': float,
+}
+
+NUMPY_TYPES = {
+    'l': 'int64',
+    'd': 'float64',
+}
+
+OUTPUTS = (None, 'list', 'array', 'numpy')
+
+
+def is_array(value):
+    return isinstance(value, array.array) or \
+        numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def to_list(values, typecode):
+    if isinstance(values, array.array):
+        if values.typecode == typecode:
+            return values.tolist()
+        values = values.tolist()
+    elif numpy is not None and isinstance(values, numpy.ndarray):
+        return values.astype(NUMPY_TYPES[typecode]).tolist()
+    return map(CONVERTERS[typecode], values)
+
+
+def to_numbers(values, typecode, output=None):
+    """
+    Converts numbers or numeric strings to integers (typecode 'l') or
+    floats ('d') in a single pass.
+    """
+    assert output in OUTPUTS, 'Unknown array output {!r}'.format(output)
+
+    if output == 'numpy' and numpy is not None:
+        if isinstance(values, numpy.ndarray):
+            return values.astype(NUMPY_TYPES[typecode])
+        return numpy.array(to_list(values, typecode), NUMPY_TYPES[typecode])
+
+    if output in ('array', 'numpy'):
+        if isinstance(values, array.array) and values.typecode == typecode:
+            return values
+        return array.array(typecode, to_list(values, typecode))
+
+    return to_list(values, typecode)
+
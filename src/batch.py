@@ -0,0 +1,261 @@
+"""
+Batch of sub-requests to resources of an Api in one HTTP request.
+
+    POST /v1/batch
+    [
+        {"method": "GET", "resource": "hotels", "params": {"city": 1}},
+        {"method": "GET", "resource": "hotels", "identity": "10"},
+        {"method": "POST", "resource": "bookings", "body": {"hotel": 10}}
+    ]
+
+Sub-requests are dispatched to registered resources directly, with
+headers and user of the batch request, and are always rendered as JSON.
+GET sub-requests preceding the first write run concurrently on a thread
+pool of REST_BATCH_WORKERS threads shared by all batches. Pool threads
+have their own database connections and transactions, so once a write
+has run, the rest of the batch runs one by one on the request thread and
+sees its uncommitted changes. Bodies of non-JSON sub-responses are
+embedded as strings. Response holds status, body and duration of every
+sub-request in order:
+
+    {"responses": [{"status": 200, "time": 12.5, "body": ...}, ...],
+     "meta": {"time": 14.1}}
+"""
+import copy
+import json
+import threading
+import time
+
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.db import connections
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+from . import default_error_responses
+from . import encoders
+from . import negotiation
+from . import params
+from .resource import Resource
+from .response import JsonResponse
+
+# Max number of sub-requests in a batch
+BATCH_MAX_SIZE = getattr(settings, 'REST_BATCH_MAX_SIZE', 50)
+
+# Number of threads running GET sub-requests, 0 to run them one by one
+BATCH_WORKERS = getattr(settings, 'REST_BATCH_WORKERS', 4)
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Request headers that don't apply to sub-requests
+SKIPPED_HEADERS = (
+    'HTTP_ACCEPT_ENCODING', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+    'CONTENT_LENGTH',
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPool(BATCH_WORKERS)
+    return _pool
+
+
+def invalid(reason):
+    default_error_responses.InvalidBatchResponse(reason=reason).throw()
+
+
+class SubRequest(object):
+    def __init__(self, method, resource_name, resource, identity=None,
+                 params=None, body=None):
+        super(SubRequest, self).__init__()
+        self.method = method
+        self.resource_name = resource_name
+        self.resource = resource
+        self.identity = identity
+        self.params = params or {}
+        self.body = body
+
+
+def make_query(values):
+    query = QueryDict('', mutable=True)
+    for name, value in values.items():
+        if isinstance(value, (list, tuple)):
+            query.setlist(name, [unicode(item) for item in value])
+        else:
+            query[name] = unicode(value)
+    return query
+
+
+class BatchResource(Resource):
+    """
+    Runs sub-requests of a batch, see module docs.
+    """
+
+    def __init__(self, api, max_size=None, workers=None):
+        super(BatchResource, self).__init__()
+        self.api = api
+        self.max_size = BATCH_MAX_SIZE if max_size is None else max_size
+        self.workers = BATCH_WORKERS if workers is None else workers
+
+    def parse(self, request):
+        """
+        :rtype: list of SubRequest
+        """
+        try:
+            items = params.request_body(request)
+        except ValueError:
+            invalid(u'body is not decodable')
+
+        if not isinstance(items, list) or not items:
+            invalid(u'body must be a non-empty list')
+        if len(items) > self.max_size:
+            invalid(u'more than {} sub-requests'.format(self.max_size))
+
+        resources = self.api.get_resources()
+        sub_requests = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                invalid(u'sub-request {} is not an object'.format(index))
+
+            method = unicode(item.get('method', 'GET')).upper()
+            if method not in METHODS:
+                invalid(u'sub-request {} has unknown method {}'.format(
+                    index, method
+                ))
+
+            name = item.get('resource')
+            if name not in resources:
+                invalid(u'sub-request {} has unknown resource {}'.format(
+                    index, name
+                ))
+
+            sub_params = item.get('params') or {}
+            if not isinstance(sub_params, dict):
+                invalid(u'params of sub-request {} are not an object'.format(
+                    index
+                ))
+
+            identity = item.get('identity')
+            sub_requests.append(SubRequest(
+                method, name, resources[name],
+                None if identity is None else unicode(identity),
+                sub_params, item.get('body')
+            ))
+        return sub_requests
+
+    def make_request(self, request, sub_request):
+        """
+        Copy of the batch request with method, path, params and body of the
+        sub-request. Sub-responses are always uncompressed JSON.
+        """
+        sub = copy.copy(request)
+        sub.method = sub_request.method
+        sub.path = request.path.rstrip('/').rsplit('/', 1)[0] + '/' + \
+            sub_request.resource_name
+        if sub_request.identity is not None:
+            sub.path += '/' + sub_request.identity
+        sub.path_info = sub.path
+
+        sub.META = dict(request.META)
+        for header in SKIPPED_HEADERS:
+            sub.META.pop(header, None)
+        sub.META['REQUEST_METHOD'] = sub_request.method
+        sub.META['HTTP_ACCEPT'] = negotiation.JSON.content_type
+        sub.META['CONTENT_TYPE'] = negotiation.JSON.content_type
+
+        sub.GET = make_query(sub_request.params)
+        sub.META['QUERY_STRING'] = sub.GET.urlencode()
+        sub._body = '' if sub_request.body is None else \
+            encoders.dumps(sub_request.body)
+        sub._post = QueryDict('')
+        sub._files = MultiValueDict()
+        return sub
+
+    def run(self, request, sub_request):
+        """
+        (response, duration in milliseconds)
+        """
+        started = time.time()
+        response = sub_request.resource(
+            self.make_request(request, sub_request), sub_request.identity
+        )
+        return response, round((time.time() - started) * 1000, 1)
+
+    def run_in_thread(self, args):
+        try:
+            return self.run(*args)
+        finally:
+            for connection in connections.all():
+                connection.close()
+
+    def run_all(self, request, sub_requests):
+        results = []
+        reads = []
+        written = False
+
+        def flush():
+            if len(reads) > 1 and self.workers:
+                results.extend(get_pool().map(
+                    self.run_in_thread,
+                    [(request, sub_request) for sub_request in reads]
+                ))
+            else:
+                results.extend(
+                    self.run(request, sub_request) for sub_request in reads
+                )
+            del reads[:]
+
+        for sub_request in sub_requests:
+            if sub_request.method == 'GET' and not written:
+                reads.append(sub_request)
+                continue
+            flush()
+            written = True
+            results.append(self.run(request, sub_request))
+        flush()
+        return results
+
+    def get_body(self, response):
+        if getattr(response, 'streaming', False):
+            content = ''.join(response.streaming_content)
+        else:
+            content = response.content
+        if not content:
+            return 'null'
+        if response.get('Content-Type', '').startswith(
+                negotiation.JSON.content_type):
+            return content
+        return json.dumps(content.decode('utf-8', 'replace'))
+
+    def render(self, results, duration):
+        """
+        Envelope with encoded bodies of sub-responses embedded as they are.
+        """
+        items = [
+            '{{"status": {}, "time": {}, "body": {}}}'.format(
+                response.status_code, json.dumps(sub_duration),
+                self.get_body(response)
+            )
+            for response, sub_duration in results
+        ]
+        content = '{{"responses": [{}], "meta": {{"time": {}}}}}'.format(
+            ', '.join(items), json.dumps(duration)
+        )
+        if negotiation.get_renderer() is negotiation.JSON:
+            return JsonResponse(content)
+        return JsonResponse(json.loads(content))
+
+    def create_list(self, request, *args, **kwargs):
+        started = time.time()
+        sub_requests = self.parse(request)
+        results = self.run_all(request, sub_requests)
+        return self.render(
+            results, round((time.time() - started) * 1000, 1)
+        )
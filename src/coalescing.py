@@ -0,0 +1,131 @@
+"""
+Coalescing of identical concurrent GET requests.
+
+    class HotelResource(Resource):
+        single_flight = {
+            'get_list': SingleFlight(backend='default'),
+        }
+
+The first request computes the response, identical requests arriving
+while it is in flight wait for it and get a copy of it instead of running
+the same queries. Requests are identical when they have the same dispatch
+key, path, query string, renderer, content encoding, user and `vary_headers`.
+With a django cache `backend` the computation is shared by processes as
+well: other processes poll the backend for the result of the flight which
+held the lock when they arrived. Streaming responses and responses setting cookies are not shared,
+waiting requests compute them on their own.
+"""
+import hashlib
+import threading
+import time
+import uuid
+
+from django.core.cache import get_cache
+
+from .response_cache import CachedResponse, get_request_key_parts, \
+    get_vary_headers, not_modified, unconditional
+
+
+class Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight(object):
+
+    def __init__(self, vary_headers=(), backend=None, timeout=30,
+                 poll_interval=0.05, name=None):
+        """
+        :param timeout: max time to wait for a response computed by another
+            request, in seconds
+        :param backend: django cache alias for locks shared by processes
+        """
+        super(SingleFlight, self).__init__()
+        self.name = name
+        self.vary_headers = get_vary_headers(vary_headers)
+        self.backend = get_cache(backend) if backend else None
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def get_key(self, request, dispatch_key, renderer):
+        parts = [self.name] + get_request_key_parts(
+            request, dispatch_key, renderer, vary_user=True,
+            vary_headers=self.vary_headers
+        )
+        key = u':'.join(unicode(part) for part in parts)
+        return 'rest:flight:' + hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    def do(self, key, compute):
+        """
+        Response returned by `compute()`, called once for concurrent calls
+        with the same key.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+
+        if not leader:
+            flight.done.wait(self.timeout)
+            if flight.result is not None:
+                return flight.result.to_response()
+            return compute()
+
+        try:
+            response = self.do_shared(key, compute)
+            flight.result = CachedResponse.from_response(response)
+            return response
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def do_shared(self, key, compute):
+        if self.backend is None:
+            return compute()
+
+        lock_key = key + ':lock'
+        result_key = key + ':result'
+        token = uuid.uuid4().hex
+        deadline = time.time() + self.timeout
+        # token of the flight being waited for, results of other flights
+        # are outdated
+        flight = None
+        while True:
+            if flight is not None:
+                stored = self.backend.get(result_key)
+                if stored is not None and stored[0] == flight:
+                    return stored[1].to_response()
+            if self.backend.add(lock_key, token, self.timeout):
+                break
+            flight = self.backend.get(lock_key) or flight
+            if time.time() > deadline:
+                return compute()
+            time.sleep(self.poll_interval)
+
+        try:
+            response = compute()
+            result = CachedResponse.from_response(response)
+            if result is not None:
+                self.backend.set(result_key, (token, result), self.timeout)
+            return response
+        finally:
+            self.backend.delete(lock_key)
+
+    def get_response(self, request, dispatch_key, renderer, respond):
+        """
+        Response shared with identical concurrent requests or the one
+        returned by `respond(request)`.
+        """
+        if request.method != 'GET':
+            return respond(request)
+
+        key = self.get_key(request, dispatch_key, renderer)
+        response = self.do(key, lambda: respond(unconditional(request)))
+        if response.status_code == 200:
+            return not_modified(request, response.items()) or response
+        return response
@@ -0,0 +1,140 @@
+"""
+gzip compression of responses negotiated with Accept-Encoding.
+
+Bodies shorter than REST_GZIP_MIN_SIZE are sent as is. Compressed bodies
+are remembered by hash of the body, so identical responses, for
+example served from caches, are compressed only once. Streaming responses
+are compressed chunk by chunk.
+"""
+import hashlib
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .lru import LRUCache
+
+GZIP_ENABLED = getattr(settings, 'REST_GZIP', True)
+
+# Min size of a body worth compressing, in bytes
+GZIP_MIN_SIZE = getattr(settings, 'REST_GZIP_MIN_SIZE', 1024)
+
+GZIP_LEVEL = getattr(settings, 'REST_GZIP_LEVEL', 6)
+
+# Max number of compressed bodies kept in process
+GZIP_CACHE_SIZE = getattr(settings, 'REST_GZIP_CACHE_SIZE', 128)
+
+# zlib window bits producing gzip header and trailer
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+ETAG_SUFFIX = ';gzip'
+
+compressed_cache = LRUCache(GZIP_CACHE_SIZE)
+
+re_q = re.compile(r'^\s*q\s*=\s*([0-9.]+)\s*$')
+
+
+def get_quality(params):
+    for param in params:
+        match = re_q.match(param)
+        if match:
+            try:
+                return float(match.group(1))
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def accepts_gzip(request):
+    """
+    True when Accept-Encoding allows gzip, explicitly or with `*`.
+    """
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    qualities = {}
+    for item in header.split(','):
+        params = item.split(';')
+        coding = params[0].strip().lower()
+        if coding:
+            qualities[coding] = get_quality(params[1:])
+
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def compress(data, level=None):
+    compressor = zlib.compressobj(
+        GZIP_LEVEL if level is None else level, zlib.DEFLATED, GZIP_WBITS
+    )
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_sequence(sequence, level=None):
+    """
+    Compresses chunks as they come, every chunk is flushed, so clients
+    can start reading before the response is complete.
+    """
+    compressor = zlib.compressobj(
+        GZIP_LEVEL if level is None else level, zlib.DEFLATED, GZIP_WBITS
+    )
+    for chunk in sequence:
+        data = compressor.compress(chunk) + \
+            compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def get_cache_key(content):
+    # ETags can't be trusted here: version ETags may be shared by different
+    # bodies, for example by responses for different users
+    return 'md5:' + hashlib.md5(content).hexdigest()
+
+
+def compress_content(content):
+    key = get_cache_key(content)
+    compressed = compressed_cache.get(key)
+    if compressed is None:
+        compressed = compress(content)
+        compressed_cache.set(key, compressed)
+    return compressed
+
+
+def compress_response(request, response, min_size=None):
+    """
+    Compresses response with gzip when client accepts it and body is large
+    enough. Responses that already have Content-Encoding are left as is.
+    """
+    if not GZIP_ENABLED or response.has_header('Content-Encoding'):
+        return response
+
+    min_size = GZIP_MIN_SIZE if min_size is None else min_size
+    streaming = getattr(response, 'streaming', False)
+    if not streaming and len(response.content) < min_size:
+        return response
+
+    patch_vary_headers(response, ('Accept-Encoding', ))
+    if not accepts_gzip(request):
+        return response
+
+    if streaming:
+        response.streaming_content = compress_sequence(
+            response.streaming_content
+        )
+        if response.has_header('Content-Length'):
+            del response['Content-Length']
+    else:
+        content = response.content
+        compressed = compress_content(content)
+        if len(compressed) >= len(content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+
+    if response.has_header('ETag'):
+        # representation differs, like GZipMiddleware does
+        response['ETag'] = re.sub('"$', ETAG_SUFFIX + '"', response['ETag'])
+    response['Content-Encoding'] = 'gzip'
+    return response
@@ -0,0 +1,79 @@
+"""
+ETag and Last-Modified handling for conditional GET requests.
+"""
+import calendar
+import datetime
+import hashlib
+
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, \
+    quote_etag
+
+
+def make_etag(*parts, **kwargs):
+    """
+    Quoted ETag for parts identifying a representation, weak when
+    weak=True.
+    """
+    key = u':'.join(unicode(part) for part in parts)
+    etag = quote_etag(hashlib.md5(key.encode('utf-8')).hexdigest())
+    if kwargs.get('weak'):
+        etag = 'W/' + etag
+    return etag
+
+
+def get_body_etag(response):
+    """
+    Strong ETag of the encoded body or None for streaming responses.
+    """
+    if getattr(response, 'streaming', False):
+        return None
+    return quote_etag(hashlib.md5(response.content).hexdigest())
+
+
+def get_last_modified(version):
+    """
+    Last-Modified timestamp for a datetime version, naive datetimes are
+    considered to be in UTC.
+    """
+    if isinstance(version, datetime.datetime):
+        return calendar.timegm(version.utctimetuple())
+    return None
+
+
+def is_not_modified(request, etag, last_modified):
+    """
+    If-None-Match is compared weakly as required for GET, If-Modified-Since
+    is used only when there is no If-None-Match.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        if etag is None:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        # ETags of compressed responses have ;gzip suffix
+        etags = [
+            value[:-len(';gzip')] if value.endswith(';gzip') else value
+            for value in parse_etags(if_none_match)
+        ]
+        return parse_etags(etag)[0] in etags
+
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since and last_modified is not None:
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        return if_modified_since is not None and \
+            int(last_modified) <= if_modified_since
+    return False
+
+
+def set_headers(response, etag, last_modified):
+    if etag is not None and not response.has_header('ETag'):
+        response['ETag'] = etag
+    if last_modified is not None and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def not_modified(etag, last_modified):
+    return set_headers(HttpResponseNotModified(), etag, last_modified)
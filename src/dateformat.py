@@ -0,0 +1,162 @@
+"""
+Fast formatting of dates and times with str.format templates.
+
+Templates made of %Y, %m, %d, %H, %M, %S and literal text are compiled into
+a function doing %-formatting of date attributes, which is several times
+faster than strftime. Formatted dates are remembered, since the same dates
+repeat a lot in responses. Results are the same as fmt.format(), including
+type of the string. Other templates, date subclasses and dates before 1900
+(strftime refuses them) fall back to fmt.format().
+"""
+import datetime
+
+from string import Formatter
+
+from django.conf import settings
+
+# Max number of formatted dates remembered by each template
+DATE_FORMAT_CACHE_SIZE = getattr(
+    settings, 'REST_DATE_FORMAT_CACHE_SIZE', 512
+)
+
+DIRECTIVES = {
+    'Y': ('%04d', 'year'),
+    'm': ('%02d', 'month'),
+    'd': ('%02d', 'day'),
+    'H': ('%02d', 'hour'),
+    'M': ('%02d', 'minute'),
+    'S': ('%02d', 'second'),
+}
+
+DATE_ATTRIBUTES = frozenset(['year', 'month', 'day'])
+TIME_ATTRIBUTES = frozenset(['hour', 'minute', 'second'])
+
+
+def parse_template(fmt):
+    """
+    Splits template with a single replacement field into
+    (prefix, format spec, suffix) or returns None.
+    """
+    try:
+        parsed = list(Formatter().parse(fmt))
+    except ValueError:
+        return None
+
+    prefix = []
+    suffix = []
+    spec = None
+    for literal, field_name, format_spec, conversion in parsed:
+        (prefix if spec is None else suffix).append(literal)
+        if field_name is None:
+            continue
+        if spec is not None or field_name not in ('', '0') or conversion:
+            return None
+        spec = format_spec
+
+    if spec is None:
+        return None
+    return fmt[:0].join(prefix), spec, fmt[:0].join(suffix)
+
+
+def compile_spec(spec):
+    """
+    Turns strftime spec into (%-template, attribute names) or None when it
+    has unsupported directives.
+    """
+    template = []
+    attributes = []
+    chars = iter(spec)
+    for char in chars:
+        if char != '%':
+            template.append(char)
+            continue
+
+        directive = next(chars, None)
+        if directive == '%':
+            template.append('%%')
+        elif directive in DIRECTIVES:
+            placeholder, attribute = DIRECTIVES[directive]
+            template.append(placeholder)
+            attributes.append(attribute)
+        else:
+            return None
+    return spec[:0].join(template), tuple(attributes)
+
+
+def generate_source(attributes):
+    args = ''.join('value.{}, '.format(name) for name in attributes)
+    lines = [
+        'def format_date(value, _type=type, _get=_cache.get):',
+        '    kind = _type(value)',
+        '    if kind is _datetime:',
+        '        if value.year < 1900:',
+        '            return _format(value)',
+        '        return _template % ({})'.format(args),
+    ]
+    if DATE_ATTRIBUTES.issuperset(attributes):
+        lines.extend([
+            '    if kind is _date:',
+            '        text = _get(value)',
+            '        if text is None:',
+            '            if value.year < 1900:',
+            '                return _format(value)',
+            '            text = _template % ({})'.format(args),
+            '            if len(_cache) >= _cache_size:',
+            '                _cache.clear()',
+            '            _cache[value] = text',
+            '        return text',
+        ])
+    if TIME_ATTRIBUTES.issuperset(attributes):
+        lines.extend([
+            '    if kind is _time:',
+            '        return _template % ({})'.format(args),
+        ])
+    lines.append('    return _format(value)')
+    return '\n'.join(lines) + '\n'
+
+
+def compile_formatter(fmt, cache_size=None):
+    """
+    Returns function equivalent to fmt.format for date, datetime and time
+    values.
+    """
+    parsed = parse_template(fmt)
+    if parsed is None or not parsed[1]:
+        return fmt.format
+
+    prefix, spec, suffix = parsed
+    compiled = compile_spec(spec)
+    if compiled is None:
+        return fmt.format
+
+    template, attributes = compiled
+    namespace = {
+        '_template': (
+            prefix.replace('%', '%%') + template + suffix.replace('%', '%%')
+        ),
+        '_format': fmt.format,
+        '_cache': {},
+        '_cache_size': cache_size or DATE_FORMAT_CACHE_SIZE,
+        '_date': datetime.date,
+        '_datetime': datetime.datetime,
+        '_time': datetime.time,
+    }
+    code = compile(
+        generate_source(attributes), '<date format {!r}>'.format(fmt), 'exec'
+    )
+    exec code in namespace
+    return namespace['format_date']
+
+
+_formatters = {}
+
+
+def get_formatter(fmt):
+    """
+    Returns shared compiled formatter for the template.
+    """
+    key = (type(fmt), fmt)
+    formatter = _formatters.get(key)
+    if formatter is None:
+        formatter = _formatters.setdefault(key, compile_formatter(fmt))
+    return formatter
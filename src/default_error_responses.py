@@ -15,6 +15,9 @@ OBJECT_NOT_FOUND_ERROR = 'E008'
 EMPTY_UPDATE = 'E014'
 OBJECT_ALREADY_EXISTS_ERROR = 'E015'
 UNAUTHORIZED_MODEL_ACCESS_RESPONSE = 'E016'
+INVALID_CURSOR = 'E017'
+INVALID_BATCH = 'E018'
+METHOD_NOT_ALLOWED = 'E019'
 
 NotImplementedResponse = ErrorResponse.build_new(
     METHOD_NOT_IMPLEMENTED,
@@ -22,6 +25,12 @@ NotImplementedResponse = ErrorResponse.build_new(
     501,
 )
 
+MethodNotAllowedResponse = ErrorResponse.build_new(
+    METHOD_NOT_ALLOWED,
+    u'Method {method} is not allowed. Allowed methods: {allow}.',
+    405,
+)
+
 UnauthenticatedResponse = ErrorResponse.build_new(
     UNAUTHENTICATED,
     u'You must be authenticated to access {resource} resource.',
@@ -81,3 +90,15 @@ ObjectAlreadyExistsErrorResponse = ErrorResponse.build_new(
     u'{object_type} already exists',
     400,
 )
+
+InvalidCursorResponse = ErrorResponse.build_new(
+    INVALID_CURSOR,
+    u'Cursor {cursor} is invalid.',
+    400,
+)
+
+InvalidBatchResponse = ErrorResponse.build_new(
+    INVALID_BATCH,
+    u'Batch request is invalid: {reason}.',
+    400,
+)
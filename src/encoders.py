@@ -0,0 +1,140 @@
+"""
+JSON encoding of responses.
+
+Backend is chosen with REST_JSON_ENCODER setting: 'json', 'simplejson' or
+'auto' (default) for the fastest installed one. Types which JSON doesn't
+know are converted by the registry, new types can be added with
+
+    encoders.register(Money, lambda v: float(v.amount))
+
+Subclasses of registered types use converter of the closest base class.
+"""
+import array
+import datetime
+import decimal
+import inspect
+import json
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+from django.conf import settings
+
+from .dateformat import get_formatter
+from .preparers.rows import Rows
+
+JSON_ENCODER = getattr(settings, 'REST_JSON_ENCODER', 'auto')
+
+
+class TypeRegistry(object):
+    """
+    Callable used as `default` of JSON encoders. Converter of a type is
+    found once and remembered, unknown types are encoded as null.
+    """
+
+    def __init__(self):
+        super(TypeRegistry, self).__init__()
+        self.converters = {}
+        self.resolved = {}
+
+    def register(self, value_type, converter):
+        self.converters[value_type] = converter
+        self.resolved.clear()
+
+    def resolve(self, value_type):
+        for klass in inspect.getmro(value_type):
+            converter = self.converters.get(klass)
+            if converter is not None:
+                return converter
+        return None
+
+    def __call__(self, value):
+        value_type = type(value)
+        try:
+            converter = self.resolved[value_type]
+        except KeyError:
+            converter = self.resolved[value_type] = self.resolve(value_type)
+
+        if converter is None:
+            return None
+        return converter(value)
+
+
+registry = TypeRegistry()
+register = registry.register
+
+register(decimal.Decimal, lambda v: float('{:0.2f}'.format(v)))
+register(datetime.datetime, get_formatter('{:%Y-%m-%dT%H-%M-%S}'))
+register(datetime.date, get_formatter('{:%Y-%m-%d}'))
+register(datetime.time, get_formatter('{:%H:%M:%S}'))
+register(set, list)
+register(Rows, Rows.expand)
+register(array.array, array.array.tolist)
+if numpy is not None:
+    register(numpy.ndarray, numpy.ndarray.tolist)
+    register(numpy.generic, numpy.generic.tolist)
+
+
+def make_json_encoder(default):
+    return json.JSONEncoder(default=default)
+
+
+def make_simplejson_encoder(default):
+    # keep output of the stdlib: decimals and named tuples are left to
+    # the registry and encoded as arrays
+    return simplejson.JSONEncoder(
+        default=default,
+        use_decimal=False,
+        namedtuple_as_object=False,
+        tuple_as_array=True,
+    )
+
+
+BACKENDS = {
+    'json': make_json_encoder,
+    'simplejson': make_simplejson_encoder,
+}
+
+
+def get_backend_name(name):
+    if name != 'auto':
+        return name
+    if simplejson is not None:
+        return 'simplejson'
+    return 'json'
+
+
+class Encoder(object):
+
+    def __init__(self, backend=None, default=None):
+        super(Encoder, self).__init__()
+        self.backend = get_backend_name(backend or JSON_ENCODER)
+        self.default = default or registry
+        # encoder objects are stateless, building them on every call is
+        # what json.dumps(default=...) does
+        self.encoder = BACKENDS[self.backend](self.default)
+        self.encode = self.encoder.encode
+
+    def dumps(self, obj):
+        return self.encode(obj)
+
+
+_encoder = None
+
+
+def get_encoder():
+    global _encoder
+    if _encoder is None:
+        _encoder = Encoder()
+    return _encoder
+
+
+def dumps(obj):
+    return get_encoder().encode(obj)
@@ -1,8 +1,10 @@
 import copy
 import decimal
 import datetime
+import itertools
 from dateutil import parser
 
+from .. import arrays
 from . import exceptions
 from . import settings
 
@@ -10,11 +12,14 @@ EMAIL_REGEXP = r'[^@]+@[^@]+\.[^@]+'
 
 FORM_ERROR_KEY = '__all__'
 
+# Tracks each time a Field instance is created. Used to retain order.
+creation_counter = itertools.count()
+
+
 class Field(object):
-    default_validators = [] # Default set of validators
+    __slots__ = ('validators', 'initial', 'creation_counter')
 
-    # Tracks each time a Field instance is created. Used to retain order.
-    creation_counter = 0
+    default_validators = [] # Default set of validators
 
     def __init__(self, initial=None, validators=None, **kwargs):
         self.validators = []
@@ -34,8 +39,7 @@ class Field(object):
                 )
 
         self.initial = initial
-        self.creation_counter = Field.creation_counter
-        Field.creation_counter += 1
+        self.creation_counter = next(creation_counter)
         self.validators.extend(self.default_validators)
         self.validators.extend(validators or [])
 
@@ -95,6 +99,8 @@ class Field(object):
 
 
 class CharField(Field):
+    __slots__ = ()
+
     def to_python(self, value):
         if value is None:
             return value
@@ -103,6 +109,8 @@ class CharField(Field):
 
 
 class IntegerField(Field):
+    __slots__ = ()
+
     def to_python(self, value):
         if value is None:
             return value
@@ -111,6 +119,7 @@ class IntegerField(Field):
 
 
 class DecimalField(Field):
+    __slots__ = ('decimal_places', )
 
     def __init__(self, *args, **kwargs):
         self.decimal_places = kwargs.pop('decimal_places', 8)
@@ -129,6 +138,8 @@ class DecimalField(Field):
 
 
 class DateField(Field):
+    __slots__ = ()
+
     def to_python(self, value):
         if value is None:
             return value
@@ -148,6 +159,8 @@ class DateField(Field):
 
 
 class TimeField(Field):
+    __slots__ = ()
+
     def to_python(self, value):
         if value is None:
             return value
@@ -165,6 +178,8 @@ class TimeField(Field):
 
 
 class ChoiceField(Field):
+    __slots__ = ('choices', )
+
     def __init__(self, *args, **kwargs):
         super(ChoiceField, self).__init__(*args, **kwargs)
         self.choices = set(kwargs['choices'])
@@ -180,12 +195,16 @@ class ChoiceField(Field):
 
 
 class EmailField(CharField):
+    __slots__ = ()
+
     def __init__(self, pattern=EMAIL_REGEXP, *args, **kwargs):
         kwargs['pattern'] = pattern
         super(EmailField, self).__init__(*args, **kwargs)
 
 
 class FloatField(Field):
+    __slots__ = ()
+
     def to_python(self, value):
         if value is None:
             return value
@@ -197,6 +216,7 @@ class FloatField(Field):
 
 
 class BooleanField(Field):
+    __slots__ = ()
 
     def to_python(self, value):
         if value is None:
@@ -216,12 +236,15 @@ class BooleanField(Field):
 
 
 class InstanceField(Field):
+    __slots__ = ()
 
     def to_python(self, value):
         return value
 
 
 class ArrayField(Field):
+    __slots__ = ('separator', )
+
     ARRAY_DELIMETER = ','
 
     def __init__(self, *args, **kwargs):
@@ -246,22 +269,38 @@ class ArrayField(Field):
         return super(ArrayField, self).to_python(value or [])
 
 
-class IntArrayField(ArrayField):
+class FloatArrayField(ArrayField):
+    """
+    Numbers are converted in bulk. output is None for a list, 'array' for
+    array.array or 'numpy' for numpy.ndarray, arrays are accepted as input.
+    """
+    __slots__ = ('output', )
+
+    typecode = 'd'
+
+    def __init__(self, *args, **kwargs):
+        super(FloatArrayField, self).__init__(*args, **kwargs)
+        self.output = kwargs.get('output')
 
     def to_python(self, value):
-        value = super(IntArrayField, self).to_python(value)
+        if not arrays.is_array(value):
+            value = super(FloatArrayField, self).to_python(value)
 
-        if value is None:
-            return
+            if value is None:
+                return
 
-        result = []
-        for item in value:
-            result.append(int(item))
+        return arrays.to_numbers(value, self.typecode, self.output)
 
-        return result
+
+class IntArrayField(FloatArrayField):
+    __slots__ = ()
+
+    typecode = 'l'
 
 
 class CharArrayField(ArrayField):
+    __slots__ = ()
+
     def to_python(self, value):
         value = super(CharArrayField, self).to_python(value)
         mapped = []
@@ -272,6 +311,7 @@ class CharArrayField(ArrayField):
 
 
 class DecimalArrayField(ArrayField):
+    __slots__ = ('decimal_places', )
 
     def __init__(self, *args, **kwargs):
         self.decimal_places = kwargs.pop('decimal_places', 25)
@@ -283,16 +323,15 @@ class DecimalArrayField(ArrayField):
         if value is None:
             return
 
-        mapped = []
-        for item in value:
-            mapped.append(decimal.Decimal(item).quantize(decimal.Decimal('.{dp}'.format(
-                dp='1' * self.decimal_places,
-            ))))
-
-        return mapped
+        quantum = decimal.Decimal('.{dp}'.format(
+            dp='1' * self.decimal_places,
+        ))
+        return [decimal.Decimal(item).quantize(quantum) for item in value]
 
 
 class DictArrayField(ArrayField):
+    __slots__ = ('form', )
+
     def __init__(self, form, *args, **kwargs):
         super(DictArrayField, self).__init__(*args, **kwargs)
         self.form = form
@@ -325,6 +364,7 @@ class DictArrayField(ArrayField):
 
 
 class DictField(Field):
+    __slots__ = ('form', )
 
     def __init__(self, form=None, *args, **kwargs):
         super(DictField, self).__init__(*args, **kwargs)
@@ -56,6 +56,8 @@ class DeclarativeFieldsMetaclass(type):
 
 @python_2_unicode_compatible
 class BoundField(object):
+    __slots__ = ('form', 'field', 'name', 'help_text')
+
     def __init__(self, form, field, name):
         self.form = form
         self.field = field
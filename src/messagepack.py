@@ -0,0 +1,227 @@
+"""
+MessagePack encoding with the same type conversions as JSON responses.
+
+Pure Python implementation is used unless msgpack C extension is
+installed. Unicode and byte strings are packed as str type, like JSON
+treats them, bytearray as bin. Types MessagePack doesn't know are converted
+with encoders.registry.
+"""
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from . import encoders
+
+CONTENT_TYPE = 'application/x-msgpack'
+
+
+class UnpackException(ValueError):
+    pass
+
+
+def pack_header(write, size, fix_mask, fix_limit, codes):
+    if size < fix_limit:
+        write(chr(fix_mask | size))
+    elif size < 0x100 and codes[0] is not None:
+        write(codes[0] + chr(size))
+    elif size < 0x10000:
+        write(codes[1] + struct.pack('>H', size))
+    else:
+        write(codes[2] + struct.pack('>I', size))
+
+
+STR_CODES = ('\xd9', '\xda', '\xdb')
+BIN_CODES = ('\xc4', '\xc5', '\xc6')
+ARRAY_CODES = (None, '\xdc', '\xdd')
+MAP_CODES = (None, '\xde', '\xdf')
+
+
+def pack_integer(write, obj):
+    if 0 <= obj < 0x80:
+        write(chr(obj))
+    elif -0x20 <= obj < 0:
+        write(chr(obj & 0xff))
+    elif obj >= 0:
+        if obj < 0x100:
+            write('\xcc' + chr(obj))
+        elif obj < 0x10000:
+            write('\xcd' + struct.pack('>H', obj))
+        elif obj < 0x100000000:
+            write('\xce' + struct.pack('>I', obj))
+        else:
+            write('\xcf' + struct.pack('>Q', obj))
+    elif obj >= -0x80:
+        write('\xd0' + struct.pack('>b', obj))
+    elif obj >= -0x8000:
+        write('\xd1' + struct.pack('>h', obj))
+    elif obj >= -0x80000000:
+        write('\xd2' + struct.pack('>i', obj))
+    else:
+        write('\xd3' + struct.pack('>q', obj))
+
+
+def pack_object(write, obj, default):
+    if obj is None:
+        write('\xc0')
+    elif obj is True:
+        write('\xc3')
+    elif obj is False:
+        write('\xc2')
+    elif isinstance(obj, (int, long)):
+        pack_integer(write, obj)
+    elif isinstance(obj, float):
+        write('\xcb' + struct.pack('>d', obj))
+    elif isinstance(obj, basestring):
+        if isinstance(obj, unicode):
+            obj = obj.encode('utf-8')
+        pack_header(write, len(obj), 0xa0, 0x20, STR_CODES)
+        write(obj)
+    elif isinstance(obj, bytearray):
+        pack_header(write, len(obj), 0, 0, BIN_CODES)
+        write(str(obj))
+    elif isinstance(obj, (list, tuple)):
+        pack_header(write, len(obj), 0x90, 0x10, ARRAY_CODES)
+        for item in obj:
+            pack_object(write, item, default)
+    elif isinstance(obj, dict):
+        pack_header(write, len(obj), 0x80, 0x10, MAP_CODES)
+        for key, value in obj.iteritems():
+            pack_object(write, key, default)
+            pack_object(write, value, default)
+    else:
+        pack_object(write, default(obj), default)
+
+
+def packb_python(obj, default=None):
+    chunks = []
+    pack_object(chunks.append, obj, default or encoders.registry)
+    return ''.join(chunks)
+
+
+def unpack_object(data, offset):
+    code = ord(data[offset])
+    offset += 1
+
+    if code < 0x80:
+        return code, offset
+    if code >= 0xe0:
+        return code - 0x100, offset
+    if code & 0xe0 == 0xa0:
+        return unpack_str(data, offset, code & 0x1f)
+    if code & 0xf0 == 0x90:
+        return unpack_array(data, offset, code & 0x0f)
+    if code & 0xf0 == 0x80:
+        return unpack_map(data, offset, code & 0x0f)
+
+    if code == 0xc0:
+        return None, offset
+    if code == 0xc2:
+        return False, offset
+    if code == 0xc3:
+        return True, offset
+
+    if code in SIZED:
+        kind, size_format = SIZED[code]
+        size, = struct.unpack_from(size_format, data, offset)
+        offset += struct.calcsize(size_format)
+        return kind(data, offset, size)
+
+    if code in SCALARS:
+        scalar_format = SCALARS[code]
+        value, = struct.unpack_from(scalar_format, data, offset)
+        return value, offset + struct.calcsize(scalar_format)
+
+    raise UnpackException('Unsupported type 0x{:02x}'.format(code))
+
+
+def unpack_str(data, offset, size):
+    end = offset + size
+    if end > len(data):
+        raise UnpackException('Unexpected end of data')
+    return data[offset:end].decode('utf-8'), end
+
+
+def unpack_bin(data, offset, size):
+    end = offset + size
+    if end > len(data):
+        raise UnpackException('Unexpected end of data')
+    return data[offset:end], end
+
+
+def unpack_array(data, offset, size):
+    result = []
+    for _ in xrange(size):
+        item, offset = unpack_object(data, offset)
+        result.append(item)
+    return result, offset
+
+
+def unpack_map(data, offset, size):
+    result = {}
+    for _ in xrange(size):
+        key, offset = unpack_object(data, offset)
+        value, offset = unpack_object(data, offset)
+        result[key] = value
+    return result, offset
+
+
+SIZED = {
+    0xd9: (unpack_str, '>B'),
+    0xda: (unpack_str, '>H'),
+    0xdb: (unpack_str, '>I'),
+    0xc4: (unpack_bin, '>B'),
+    0xc5: (unpack_bin, '>H'),
+    0xc6: (unpack_bin, '>I'),
+    0xdc: (unpack_array, '>H'),
+    0xdd: (unpack_array, '>I'),
+    0xde: (unpack_map, '>H'),
+    0xdf: (unpack_map, '>I'),
+}
+
+SCALARS = {
+    0xca: '>f',
+    0xcb: '>d',
+    0xcc: '>B',
+    0xcd: '>H',
+    0xce: '>I',
+    0xcf: '>Q',
+    0xd0: '>b',
+    0xd1: '>h',
+    0xd2: '>i',
+    0xd3: '>q',
+}
+
+
+def unpackb_python(data):
+    try:
+        obj, offset = unpack_object(data, 0)
+    except (IndexError, TypeError, struct.error, UnicodeDecodeError) as e:
+        raise UnpackException(unicode(e) or 'Unexpected end of data')
+    if offset != len(data):
+        raise UnpackException('Extra data')
+    return obj
+
+
+def packb_c(obj, default=None):
+    return msgpack.packb(
+        obj, default=default or encoders.registry, use_bin_type=False
+    )
+
+
+def unpackb_c(data):
+    try:
+        return msgpack.unpackb(data, raw=False)
+    except TypeError:
+        # msgpack < 0.5.2 has no raw argument
+        return msgpack.unpackb(data, encoding='utf-8')
+    except ValueError as e:
+        raise UnpackException(unicode(e))
+
+
+if msgpack is not None:
+    packb, unpackb = packb_c, unpackb_c
+else:
+    packb, unpackb = packb_python, unpackb_python
@@ -0,0 +1,121 @@
+"""
+Content negotiation of response and request body formats.
+
+Resource selects renderer by Accept header and activates it for the
+thread while the request is dispatched, so JsonResponse encodes content
+with it and preparers, forms and resources stay unchanged. JSON is used
+unless client prefers MessagePack. Request bodies are decoded according
+to Content-Type.
+"""
+import json
+import threading
+
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import encoders
+from . import messagepack
+
+# Set to False to always respond with JSON
+BINARY_RENDERERS = getattr(settings, 'REST_BINARY_RENDERERS', True)
+
+
+class Renderer(object):
+    def __init__(self, format, content_type, dumps, loads, media_types):
+        super(Renderer, self).__init__()
+        self.format = format
+        self.content_type = content_type
+        self.dumps = dumps
+        self.loads = loads
+        self.media_types = media_types
+
+
+JSON = Renderer(
+    'json', 'application/json', encoders.dumps, json.loads,
+    ('application/json', )
+)
+
+MSGPACK = Renderer(
+    'msgpack', messagepack.CONTENT_TYPE, messagepack.packb,
+    messagepack.unpackb,
+    ('application/x-msgpack', 'application/msgpack',
+     'application/vnd.msgpack')
+)
+
+RENDERERS = (JSON, MSGPACK)
+
+_local = threading.local()
+
+
+def parse_accept(header):
+    """
+    {media type: quality} for Accept header.
+    """
+    qualities = {}
+    for item in header.split(','):
+        params = item.split(';')
+        media_type = params[0].strip().lower()
+        if not media_type:
+            continue
+
+        quality = 1.0
+        for param in params[1:]:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type] = quality
+    return qualities
+
+
+def select_renderer(request):
+    """
+    Renderer with the highest quality in Accept, JSON wins ties.
+    """
+    header = request.META.get('HTTP_ACCEPT')
+    if not header or not BINARY_RENDERERS:
+        return JSON
+
+    qualities = parse_accept(header)
+    best, best_quality = JSON, 0.0
+    for renderer in RENDERERS:
+        quality = max(
+            qualities.get(media_type, 0.0)
+            for media_type in renderer.media_types
+        )
+        if quality > best_quality:
+            best, best_quality = renderer, quality
+    return best
+
+
+def get_renderer():
+    return getattr(_local, 'renderer', None) or JSON
+
+
+@contextmanager
+def activate(renderer):
+    previous = getattr(_local, 'renderer', None)
+    _local.renderer = renderer
+    try:
+        yield renderer
+    finally:
+        _local.renderer = previous
+
+
+def get_content_renderer(request):
+    content_type = request.META.get('CONTENT_TYPE', '')
+    media_type = content_type.split(';')[0].strip().lower()
+    for renderer in RENDERERS:
+        if media_type in renderer.media_types:
+            return renderer
+    return JSON
+
+
+def request_body(request):
+    """
+    Request body decoded according to Content-Type, JSON by default.
+    """
+    return get_content_renderer(request).loads(request.body)
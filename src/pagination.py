@@ -0,0 +1,208 @@
+"""
+Keyset pagination of list resources.
+
+    paginator = KeysetPaginator(ordering=('-created_at', 'id'), count='estimated')
+
+    def read_list(self, request):
+        page = self.paginate(request, Hotel.objects.all())
+        return JsonResponseWithMetadata(
+            preparer.prepare_many(page.objects), page.meta
+        )
+
+Pages are selected with `WHERE (ordering columns) > (values of the last
+object)` instead of OFFSET, so any page costs the same with an index on
+the ordering columns. Ordering columns must be NOT NULL, primary key is
+added to make it unique. Cursors are opaque `?cursor=` tokens, `meta`
+holds links to the next and previous pages and count:
+
+    'exact' - COUNT(*)
+    'estimated' - planner estimate on PostgreSQL, cached count elsewhere
+    'cached' - COUNT(*) cached for count_timeout seconds
+    None - no count
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+
+from . import default_error_responses
+
+COUNT_MODES = ('exact', 'estimated', 'cached', None)
+
+NEXT = 'n'
+PREV = 'p'
+
+
+class Page(object):
+    def __init__(self, objects, meta):
+        super(Page, self).__init__()
+        self.objects = objects
+        self.meta = meta
+
+
+class KeysetPaginator(object):
+    cursor_param = 'cursor'
+    limit_param = 'limit'
+
+    def __init__(self, ordering=('pk', ), limit=20, max_limit=100,
+                 count=None, count_timeout=300):
+        super(KeysetPaginator, self).__init__()
+        assert count in COUNT_MODES, 'Unknown count mode {!r}'.format(count)
+        self.ordering = tuple(ordering)
+        self.limit = limit
+        self.max_limit = max_limit
+        self.count = count
+        self.count_timeout = count_timeout
+
+    def get_ordering(self, model):
+        """
+        [(field, is descending)] ending with primary key.
+        """
+        pk = model._meta.pk
+        ordering = []
+        for item in self.ordering:
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            field = pk if name == 'pk' else model._meta.get_field(name)
+            ordering.append((field, descending))
+            if field == pk:
+                break
+        else:
+            ordering.append((pk, ordering[-1][1] if ordering else False))
+        return ordering
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.GET.get(self.limit_param, self.limit))
+        except (TypeError, ValueError):
+            return self.limit
+        return max(1, min(limit, self.max_limit))
+
+    def encode_cursor(self, ordering, obj, direction):
+        values = [
+            field.value_to_string(obj) for field, _ in ordering
+        ]
+        data = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data).rstrip('=')
+
+    def decode_cursor(self, ordering, cursor):
+        try:
+            data = base64.urlsafe_b64decode(
+                str(cursor) + '=' * (-len(cursor) % 4)
+            )
+            direction, values = json.loads(data)
+            if direction not in (NEXT, PREV) or len(values) != len(ordering):
+                raise ValueError(cursor)
+            values = [
+                field.to_python(value)
+                for (field, _), value in zip(ordering, values)
+            ]
+        except Exception:
+            default_error_responses.InvalidCursorResponse(
+                cursor=cursor
+            ).throw()
+        return direction, values
+
+    def get_keyset_filter(self, ordering, values, forward):
+        """
+        (a, b) > (x, y) as `a > x OR a = x AND b > y`, comparison is
+        flipped for descending columns and for backward direction.
+        """
+        condition = None
+        equal = Q()
+        for (field, descending), value in zip(ordering, values):
+            lookup = 'gt' if descending != forward else 'lt'
+            term = equal & Q(**{'{}__{}'.format(field.attname, lookup): value})
+            condition = term if condition is None else condition | term
+            equal &= Q(**{field.attname: value})
+        return condition
+
+    def get_order_by(self, ordering, forward):
+        return [
+            ('-' if descending == forward else '') + field.attname
+            for field, descending in ordering
+        ]
+
+    def get_link(self, request, cursor):
+        params = request.GET.copy()
+        params[self.cursor_param] = cursor
+        return u'{}?{}'.format(request.path, params.urlencode())
+
+    def get_count(self, queryset):
+        if self.count == 'exact':
+            return queryset.count()
+
+        if self.count == 'estimated':
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                return estimate_count(queryset, connection)
+
+        sql, params = queryset.query.sql_with_params()
+        key = 'rest:count:' + hashlib.md5(
+            u'{}:{}:{}'.format(queryset.db, sql, params).encode('utf-8')
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_timeout)
+        return count
+
+    def paginate(self, request, queryset):
+        ordering = self.get_ordering(queryset.model)
+        limit = self.get_limit(request)
+
+        cursor = request.GET.get(self.cursor_param)
+        page = queryset
+        forward = True
+        if cursor:
+            direction, values = self.decode_cursor(ordering, cursor)
+            forward = direction == NEXT
+            page = page.filter(
+                self.get_keyset_filter(ordering, values, forward)
+            )
+
+        page = page.order_by(*self.get_order_by(ordering, forward))
+        objects = list(page[:limit + 1])
+        has_more = len(objects) > limit
+        objects = objects[:limit]
+        if not forward:
+            objects.reverse()
+
+        has_next = has_more if forward else bool(cursor)
+        has_prev = bool(cursor) if forward else has_more
+
+        meta = {
+            'limit': limit,
+            'next': None,
+            'prev': None,
+        }
+        if objects and has_next:
+            meta['next'] = self.get_link(
+                request, self.encode_cursor(ordering, objects[-1], NEXT)
+            )
+        if objects and has_prev:
+            meta['prev'] = self.get_link(
+                request, self.encode_cursor(ordering, objects[0], PREV)
+            )
+        if self.count is not None:
+            meta['count'] = self.get_count(queryset)
+        return Page(objects, meta)
+
+
+def estimate_count(queryset, connection):
+    """
+    Number of rows expected by PostgreSQL planner, from table statistics.
+    """
+    sql, params = queryset.query.sql_with_params()
+    cursor = connection.cursor()
+    try:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    if isinstance(plan, basestring):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
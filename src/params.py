@@ -1,13 +1,14 @@
-import json
 import logging
 import default_error_responses
+import negotiation
 
 
 log = logging.getLogger(__name__)
 
 always_true = lambda request: True
 
-request_body = lambda r: json.loads(r.body)
+# decoded according to Content-Type: JSON or MessagePack
+request_body = negotiation.request_body
 
 
 class check(object):
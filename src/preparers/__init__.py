@@ -1,2 +1,5 @@
 from .preparer import Preparer
-from .fields import *
\ No newline at end of file
+from .fields import *
+from .accessors import Accessor, AccessorCache, accessor_cache
+from .rows import Rows
+from . import profiling
\ No newline at end of file
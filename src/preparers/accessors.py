@@ -0,0 +1,141 @@
+import operator as op
+
+from ..lru import LRUCache
+from . import settings
+
+
+def split_path(path):
+    if not path:
+        return ()
+    return tuple(path.split('.'))
+
+
+def make_step_getter(source_type, key):
+    if issubclass(source_type, dict):
+        return op.itemgetter(key)
+    return op.attrgetter(key)
+
+
+class AccessorCache(LRUCache):
+    """
+    Getters shared between all preparers, keyed by (source type, path).
+    Getter for a dotted path reads the first step with getter suitable for
+    the source type and hands the rest of the path to a nested Accessor,
+    because type of intermediate objects is not known in advance.
+    """
+
+    def build(self, source_type, path):
+        steps = split_path(path)
+        getter = make_step_getter(source_type, steps[0])
+        if len(steps) == 1:
+            return getter
+
+        rest = Accessor('.'.join(steps[1:]), cache=self)
+
+        def chained_getter(obj):
+            return rest(getter(obj))
+
+        return chained_getter
+
+    def getter(self, source_type, path):
+        key = (source_type, path)
+        getter = self.get(key)
+        if getter is None:
+            getter = self.build(source_type, path)
+            self.set(key, getter)
+        return getter
+
+
+accessor_cache = AccessorCache(max_size=settings.ACCESSOR_CACHE_SIZE)
+
+
+class Accessor(object):
+    """
+    Call site for a dotted path. Remembers getters for the few source types
+    it has seen (polymorphic inline cache) and asks the shared cache for the
+    rest, so dicts and model instances can be mixed on the same path.
+    """
+
+    def __init__(self, path, cache=None,
+                 limit=settings.ACCESSOR_INLINE_CACHE_SIZE):
+        super(Accessor, self).__init__()
+        self.path = path
+        self.cache = cache or accessor_cache
+        self.limit = limit
+        self.entries = {}
+
+    def __call__(self, obj):
+        if not self.path:
+            return obj
+
+        source_type = type(obj)
+        getter = self.entries.get(source_type)
+        if getter is None:
+            getter = self.cache.getter(source_type, self.path)
+            if len(self.entries) < self.limit:
+                self.entries[source_type] = getter
+        return getter(obj)
+
+
+def set_by_steps(res, steps, value):
+    """
+    Sets value to res by already split path.
+    Missing intermediate dicts are created on the fly.
+    """
+    context = res
+    for step in steps[:-1]:
+        if isinstance(context, dict):
+            if step not in context:
+                context[step] = {}
+            context = context[step]
+        else:
+            context = getattr(context, step)
+
+    if isinstance(context, dict):
+        context[steps[-1]] = value
+
+    return res
+
+
+class AccessorsFactory(object):
+    """
+    Path based access to objects and dicts backed by the shared accessor
+    cache. `ns` and `namespace` arguments are accepted for backward
+    compatibility only, getters are not stored per namespace anymore.
+    """
+
+    @classmethod
+    def make_getter(cls, path, key, obj, namespace=None):
+        return accessor_cache.getter(type(obj), key)
+
+    @classmethod
+    def resolve_steps(cls, obj, steps, ns=None, force_create=False):
+        res = obj
+        for step in steps:
+            try:
+                res = accessor_cache.getter(type(res), step)(res)
+            except (KeyError, AttributeError):
+                if isinstance(res, dict) and force_create:
+                    res[step] = {}
+                    res = res[step]
+                else:
+                    raise
+        return res
+
+    @classmethod
+    def get_by_path(cls, obj, path, ns=None):
+        if not path:
+            return obj
+
+        return accessor_cache.getter(type(obj), path)(obj)
+
+    @classmethod
+    def set_by_path(cls, obj, path, value, ns=None):
+        if not path:
+            return obj
+
+        return set_by_steps(obj, split_path(path), value)
+
+    @classmethod
+    def stats(cls):
+        return accessor_cache.stats()
@@ -0,0 +1,438 @@
+"""
+Opt-in cache of prepared objects.
+
+    class HotelPreparer(Preparer):
+        ...
+
+        class Meta:
+            cache = True
+            cache_version = 'updated_at'  # optional
+            cache_timeout = 300  # optional
+            cache_backend = 'default'  # optional django cache alias
+            model = Hotel  # optional, connects invalidation eagerly
+
+Entries are keyed by preparer, its context and fields, model, pk and version.
+Saving or deleting an object invalidates every entry it was embedded into,
+as long as it was prepared by a cached nested preparer. Other models reached
+by the rules (dotted sources, not cached nested preparers) invalidate all
+entries of the preparer. Cached results are shared, do not modify them.
+With a backend, entries are kept in process as well, hits there check a
+small marker in the backend, so invalidation in other processes is seen.
+
+Invalidation runs in processes which have connected signal receivers of
+the preparer. With `model` in Meta they are connected when the preparer is
+created, otherwise only when it prepares an object of a model for the first
+time. Processes saving objects without creating the preparer (admin,
+workers of other apps) don't invalidate anything, so set `model` and import
+preparers there, or keep `cache_timeout` short.
+"""
+import hashlib
+import threading
+import time
+
+from collections import defaultdict
+
+from django.core.cache import get_cache
+from django.db import models
+from django.db.models import signals
+from django.db.models.fields import FieldDoesNotExist
+
+from ..lru import LRUCache
+from . import settings
+from .compiler import get_plan
+from .queries import get_field_info, get_reverse_relation
+
+_stack = threading.local()
+
+
+def make_identity(model, pk):
+    opts = model._meta
+    return u'{}.{}:{}'.format(opts.app_label, opts.object_name.lower(), pk)
+
+
+def get_identity(obj):
+    return make_identity(type(obj), obj.pk)
+
+
+def get_frames():
+    frames = getattr(_stack, 'frames', None)
+    if frames is None:
+        frames = _stack.frames = []
+    return frames
+
+
+class CacheEntry(object):
+    def __init__(self, data, dependencies, generation, expires):
+        self.data = data
+        self.dependencies = dependencies
+        self.generation = generation
+        self.expires = expires
+
+
+class PreparedCache(object):
+
+    def __init__(self, preparer_class, version_field=None, timeout=None,
+                 backend=None, max_size=None, model=None):
+        """
+        :param model: model of prepared objects, receivers for it and
+            models reached by the rules are connected by preparers when
+            they are created, before anything is prepared
+        """
+        super(PreparedCache, self).__init__()
+        self.name = u'{}.{}'.format(
+            preparer_class.__module__, preparer_class.__name__
+        )
+        self.version_field = version_field
+        self.timeout = timeout or settings.PREPARED_CACHE_TIMEOUT
+        self.local = LRUCache(
+            max_size or settings.PREPARED_CACHE_SIZE, on_evict=self.forget
+        )
+        self.backend = get_cache(backend) if backend else None
+        self.dependents = defaultdict(set)
+        # child model -> foreign keys to parents embedding its objects
+        # through reverse relations
+        self.parent_fields = defaultdict(set)
+        self.generation = 0
+        self.model = model
+        self.models = set()
+        self.lock = threading.Lock()
+
+    def make_key(self, *parts):
+        key = u':'.join([self.name] + [unicode(p) for p in parts])
+        return 'rest:prepared:' + hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    @property
+    def generation_key(self):
+        return self.make_key('generation')
+
+    def get_backend_generation(self, values):
+        return values.get(self.generation_key) or 0
+
+    def track(self, dependencies):
+        for frame in get_frames():
+            frame.update(dependencies)
+
+    def get_marker_key(self, key):
+        return key + ':valid'
+
+    def is_valid_in_backend(self, key):
+        """
+        Local entries are checked against a small marker, which is deleted
+        by invalidation in any process.
+        """
+        marker_key = self.get_marker_key(key)
+        values = self.backend.get_many([marker_key, self.generation_key])
+        marker = values.get(marker_key)
+        return marker is not None and \
+            marker == self.get_backend_generation(values)
+
+    def get(self, key):
+        entry = self.local.get(key)
+        if entry is not None and entry.generation == self.generation and \
+                entry.expires > time.time():
+            if self.backend is None or self.is_valid_in_backend(key):
+                return entry
+            self.drop(key)
+            return None
+
+        if self.backend is None:
+            return None
+
+        values = self.backend.get_many([key, self.generation_key])
+        entry = values.get(key)
+        if entry is not None and \
+                entry.generation == self.get_backend_generation(values):
+            entry.generation = self.generation
+            self.remember(key, entry)
+            return entry
+        return None
+
+    def remember(self, key, entry):
+        self.drop(key)
+        self.local.set(key, entry)
+        with self.lock:
+            for identity in entry.dependencies:
+                self.dependents[identity].add(key)
+
+    def forget(self, key, entry):
+        """
+        Removes key of the entry, which is no longer kept locally, from
+        dependents.
+        """
+        with self.lock:
+            for identity in entry.dependencies:
+                keys = self.dependents.get(identity)
+                if keys is None:
+                    continue
+                keys.discard(key)
+                if not keys:
+                    del self.dependents[identity]
+
+    def drop(self, key):
+        entry = self.local.pop(key)
+        if entry is not None:
+            self.forget(key, entry)
+
+    def set(self, key, entry):
+        self.remember(key, entry)
+        if self.backend is None:
+            return
+
+        generation = self.get_backend_generation(
+            self.backend.get_many([self.generation_key])
+        )
+        backend_entry = CacheEntry(
+            entry.data, entry.dependencies, generation, entry.expires
+        )
+        self.backend.set_many({
+            key: backend_entry,
+            self.get_marker_key(key): generation,
+        }, self.timeout)
+        for identity in entry.dependencies:
+            dependents_key = self.make_key('dependents', identity)
+            keys = self.backend.get(dependents_key) or set()
+            keys.add(key)
+            self.backend.set(dependents_key, keys, self.timeout)
+
+    def get_or_prepare(self, preparer, obj):
+        if not isinstance(obj, models.Model) or obj.pk is None:
+            return preparer.serialize(obj)
+
+        self.connect(preparer, type(obj))
+
+        identity = get_identity(obj)
+        version = None
+        if self.version_field:
+            version = getattr(obj, self.version_field)
+        key = self.make_key(
+            preparer.context, preparer.fields, identity, version
+        )
+
+        entry = self.get(key)
+        if entry is not None:
+            self.track(entry.dependencies)
+            return entry.data
+
+        frames = get_frames()
+        frame = set([identity])
+        frames.append(frame)
+        try:
+            data = preparer.serialize(obj)
+        finally:
+            frames.pop()
+
+        dependencies = frozenset(frame)
+        self.track(dependencies)
+        self.set(key, CacheEntry(
+            data, dependencies, self.generation, time.time() + self.timeout
+        ))
+        return data
+
+    def invalidate(self, identity):
+        with self.lock:
+            keys = self.dependents.pop(identity, ())
+        for key in keys:
+            self.drop(key)
+
+        if self.backend is not None:
+            dependents_key = self.make_key('dependents', identity)
+            keys = self.backend.get(dependents_key) or set()
+            self.backend.delete_many(
+                list(keys) + [self.get_marker_key(key) for key in keys] +
+                [dependents_key]
+            )
+
+    def invalidate_all(self):
+        self.generation += 1
+        self.local.clear()
+        with self.lock:
+            self.dependents.clear()
+        if self.backend is not None:
+            self.backend.add(self.generation_key, 0)
+            self.backend.incr(self.generation_key)
+
+    def connect(self, preparer, model):
+        key = (model, preparer.context)
+        if key in self.models:
+            return
+
+        with self.lock:
+            if key in self.models:
+                return
+            self.models.add(key)
+
+        # projections share the cache, so models reached by all rules of
+        # the class are connected, whichever preparer comes first
+        plan = get_plan(type(preparer), preparer.context)
+        links = Links()
+        connect_model(model, self, precise=True)
+        for related_model, precise in get_related_models(
+                plan, model, links).items():
+            connect_model(related_model, self, precise)
+
+        with self.lock:
+            for child_model, fields in links.parent_fields.items():
+                self.parent_fields[child_model].update(fields)
+        for through in links.through_models:
+            connect_m2m(through, self)
+
+    def invalidate_parents(self, instance):
+        """
+        Parents don't embed objects, which are just added to them, so they
+        are found by foreign keys of the objects.
+        """
+        for field in self.parent_fields.get(type(instance), ()):
+            value = getattr(instance, field.attname)
+            if value is not None:
+                self.invalidate(make_identity(field.rel.to, value))
+
+
+class Links(object):
+    """
+    Relations of the models reached by preparer rules, which are changed
+    without saving the embedding object.
+    """
+
+    def __init__(self):
+        super(Links, self).__init__()
+        self.parent_fields = defaultdict(set)
+        self.through_models = set()
+
+    def add(self, model, name):
+        opts = model._meta
+        related = get_reverse_relation(opts, name)
+        if related is not None:
+            field = related.field
+            if isinstance(field, models.ManyToManyField):
+                self.through_models.add(field.rel.through)
+            else:
+                self.parent_fields[related.model].add(field)
+            return
+
+        try:
+            field, _, direct, m2m = opts.get_field_by_name(name)
+        except FieldDoesNotExist:
+            return
+        if direct and m2m:
+            self.through_models.add(field.rel.through)
+
+
+def get_related_models(plan, model, links=None):
+    """
+    Models reached by rules of the preparer plan. Objects prepared by a cached nested
+    preparer are tracked precisely, for other models particular entries
+    can't be found, so changes of them invalidate everything.
+    Returns {model: is tracked precisely}, reverse and many to many
+    relations are collected to `links`.
+    """
+    result = {}
+
+    def add(related_model, precise):
+        # model reached both ways has to invalidate everything
+        result[related_model] = result.get(related_model, precise) and precise
+
+    for rule_plan in plan.rules:
+        current = model
+        traversed = []
+        for step in rule_plan.context_steps + rule_plan.src_steps:
+            info = get_field_info(current, step)
+            if info is None or info[1] is None:
+                current = None
+                break
+            if links is not None and info[2]:
+                links.add(current, step)
+            current = info[1]
+            traversed.append(current)
+
+        serializer = getattr(rule_plan.rule, 'serializer', None)
+        if current is not None and hasattr(serializer, 'plan'):
+            if getattr(serializer, 'cache', None) is not None:
+                # objects of the last model are tracked by nested cache
+                if traversed:
+                    traversed.pop()
+                add(current, True)
+            for related_model, precise in get_related_models(
+                    serializer.plan, current, links).items():
+                add(related_model, precise)
+
+        for related_model in traversed:
+            add(related_model, False)
+    return result
+
+
+# model -> {cache: is precise}
+_receivers = defaultdict(dict)
+
+
+def invalidate_instance(sender, instance, **kwargs):
+    # objects moved to another parent are invalidated in the old one by
+    # identity, and in the new one by foreign key
+    identity = get_identity(instance)
+    for cache, precise in _receivers.get(sender, {}).items():
+        if precise:
+            cache.invalidate(identity)
+            cache.invalidate_parents(instance)
+        else:
+            cache.invalidate_all()
+
+
+# through model -> caches
+_m2m_receivers = defaultdict(set)
+
+
+def invalidate_m2m(sender, instance, action, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    for cache in _m2m_receivers.get(sender, ()):
+        precise = _receivers[type(instance)].get(cache, False) and \
+            _receivers[model].get(cache, False)
+        if not precise or pk_set is None:
+            cache.invalidate_all()
+            continue
+        cache.invalidate(get_identity(instance))
+        for pk in pk_set:
+            cache.invalidate(make_identity(model, pk))
+
+
+def connect_model(model, cache, precise):
+    receivers = _receivers[model]
+    receivers[cache] = receivers.get(cache, precise) and precise
+
+    signals.post_save.connect(
+        invalidate_instance, sender=model, weak=False,
+        dispatch_uid='rest_prepared_cache'
+    )
+    signals.post_delete.connect(
+        invalidate_instance, sender=model, weak=False,
+        dispatch_uid='rest_prepared_cache'
+    )
+
+
+def connect_m2m(through, cache):
+    _m2m_receivers[through].add(cache)
+    signals.m2m_changed.connect(
+        invalidate_m2m, sender=through, weak=False,
+        dispatch_uid='rest_prepared_cache'
+    )
+
+
+def get_prepared_cache(preparer_class):
+    """
+    Returns PreparedCache for preparer class with `cache = True` in Meta.
+    """
+    if 'prepared_cache' in preparer_class.__dict__:
+        return preparer_class.prepared_cache
+
+    meta = preparer_class._meta
+    prepared_cache = None
+    if getattr(meta, 'cache', False):
+        prepared_cache = PreparedCache(
+            preparer_class,
+            version_field=getattr(meta, 'cache_version', None),
+            timeout=getattr(meta, 'cache_timeout', None),
+            backend=getattr(meta, 'cache_backend', None),
+            model=getattr(meta, 'model', None),
+        )
+    preparer_class.prepared_cache = prepared_cache
+    return prepared_cache
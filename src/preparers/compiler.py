@@ -0,0 +1,338 @@
+import copy
+import functools
+
+from decimal import Decimal
+from itertools import izip
+
+from . import fields
+from . import settings
+from ..lru import LRUCache
+from .accessors import split_path, set_by_steps
+from .rows import Rows
+
+
+# Conversions that are simple enough to be inlined into generated code
+# instead of calling rule.get_value for every object. Keyed by the function
+# object, so a subclass overriding get_value falls back to the method call.
+INLINE_CONVERTERS = {
+    fields.Field.get_value.__func__: None,
+    fields.IntField.get_value.__func__: 'int',
+    fields.FloatField.get_value.__func__: 'float',
+    fields.BooleanField.get_value.__func__: 'bool',
+    fields.DecimalField.get_value.__func__: 'Decimal',
+}
+
+# Field methods which, when overridden, make the rule opaque to the compiler
+CUSTOM_HOOKS = ('set_value', 'get_value_from_context_and_set_to_result')
+
+INLINE_BUILTINS = {
+    'int': int,
+    'float': float,
+    'bool': bool,
+    'Decimal': Decimal,
+}
+
+
+class RulePlan(object):
+    """
+    Everything that can be computed about a rule without looking at an
+    object: split paths, effective context and a way to convert the value.
+    """
+
+    def __init__(self, rule, index):
+        self.rule = rule
+        self.index = index
+        self.context_steps = split_path(rule.context)
+        self.src_steps = split_path(rule.src)
+        self.trg_steps = split_path(rule.trg)
+
+        # rules overriding these hooks are called as they are, output of
+        # such rules can't be built column by column
+        self.is_custom = any(
+            get_owner(type(rule), hook) is not fields.Field
+            for hook in CUSTOM_HOOKS
+        )
+
+        get_value = getattr(type(rule).get_value, '__func__', None)
+        self.is_inlined = get_value in INLINE_CONVERTERS
+        self.converter = INLINE_CONVERTERS.get(get_value)
+
+        self.fetch_column = build_function(
+            generate_fetch_column_source(self), (self, ), 'fetch_column'
+        )
+        if has_batch_conversion(type(rule)):
+            self.get_values = rule.get_values
+        else:
+            self.get_values = functools.partial(
+                fields.Field.get_values.__func__, rule
+            )
+
+    @property
+    def name(self):
+        return '_rule_{}'.format(self.index)
+
+    @property
+    def step(self):
+        """
+        Generated code of the rule from `Plan.serialize` as a function of
+        (obj, res), compiled on first use. Used by profiling to measure
+        rules one by one.
+        """
+        step = self.__dict__.get('_step')
+        if step is None:
+            step = self._step = build_function(
+                generate_step_source(self), (self, ), 'step'
+            )
+        return step
+
+
+class Plan(object):
+    """
+    Compiled representation of preparer rules. `serialize` is a generated
+    function which turns a single object into a dict without iterating over
+    rules, `serialize_many` does the same for a list of objects column by
+    column.
+    """
+
+    def __init__(self, rules):
+        self.bound_rules = tuple(rules)
+        self.rules = tuple(
+            RulePlan(rule, index) for index, rule in enumerate(rules)
+        )
+        self.source = generate_source(self.rules)
+        self.serialize = build_function(self.source, self.rules, 'serialize')
+        self.query_plans = {}
+        self.values_plans = {}
+        # fields come from requests, so projections are bounded
+        self.projections = LRUCache(settings.PROJECTION_CACHE_SIZE)
+
+        self.is_columnar = not any(
+            rule_plan.is_custom for rule_plan in self.rules
+        )
+
+        targets = [rule_plan.trg_steps for rule_plan in self.rules]
+        self.schema = tuple(targets)
+        self.flat_keys = None
+        if all(len(steps) == 1 for steps in targets) and \
+                len(set(targets)) == len(targets):
+            self.flat_keys = tuple(steps[0] for steps in targets)
+
+    def get_column(self, rule_plan, objects):
+        column = rule_plan.get_values(rule_plan.fetch_column(objects))
+        default = rule_plan.rule.default
+        if default is not None:
+            column = [default if v is None else v for v in column]
+        return column
+
+    def serialize_many(self, objects):
+        if not self.is_columnar:
+            return map(self.serialize, objects)
+        if not isinstance(objects, list):
+            objects = list(objects)
+
+        try:
+            columns = [
+                self.get_column(rule_plan, objects)
+                for rule_plan in self.rules
+            ]
+        except Exception:
+            # Serialize object by object, so the error is raised and logged
+            # exactly as it is when preparer is called for a single object
+            return map(self.serialize, objects)
+        return self.build_rows(objects, columns)
+
+    def serialize_rows(self, objects):
+        """
+        serialize_many returning Rows of tuples instead of dicts.
+        """
+        if not isinstance(objects, list):
+            objects = list(objects)
+
+        try:
+            columns = [
+                self.get_column(rule_plan, objects)
+                for rule_plan in self.rules
+            ]
+        except Exception:
+            return Rows.from_dicts(self.schema, map(self.serialize, objects))
+
+        if columns:
+            return Rows(self.schema, zip(*columns))
+        return Rows(self.schema, [() for _ in objects])
+
+    def build_rows(self, objects, columns):
+        if self.flat_keys is not None and columns:
+            keys = self.flat_keys
+            return [dict(izip(keys, row)) for row in izip(*columns)]
+
+        rows = [{} for _ in objects]
+        for rule_plan, column in izip(self.rules, columns):
+            steps = rule_plan.trg_steps
+            for row, value in izip(rows, column):
+                set_by_steps(row, steps, value)
+        return rows
+
+
+def get_owner(field_class, name):
+    """
+    First class in the MRO of the field class which defines the method.
+    """
+    for klass in field_class.__mro__:
+        if name in klass.__dict__:
+            return klass
+    return None
+
+
+def has_batch_conversion(field_class):
+    """
+    get_values can be used only if it was written with get_value of the
+    class in mind, i.e. it is defined on the same class or on a subclass.
+    """
+    return issubclass(
+        get_owner(field_class, 'get_values'),
+        get_owner(field_class, 'get_value')
+    )
+
+
+def _getter_lines(var, steps, indent):
+    lines = []
+    for step in steps:
+        lines.append(
+            '{indent}{var} = {var}[{key}] if _isinstance({var}, _dict) '
+            'else _getattr({var}, {key})'.format(
+                indent=indent, var=var, key=repr(step)
+            )
+        )
+    return lines
+
+
+def _fetch_lines(rule_plan, indent):
+    lines = ['{}l = obj'.format(indent)]
+    lines.extend(_getter_lines('l', rule_plan.context_steps, indent))
+    lines.append('{}v = l'.format(indent))
+    lines.extend(_getter_lines('v', rule_plan.src_steps, indent))
+    lines.append('{}if _callable(v):'.format(indent))
+    lines.append('{}    v = v()'.format(indent))
+    return lines
+
+
+def generate_fetch_column_source(rule_plan):
+    lines = [
+        'def fetch_column(objects, _isinstance=isinstance, _dict=dict, '
+        '_getattr=getattr, _callable=callable):',
+        '    column = []',
+        '    append = column.append',
+        '    for obj in objects:',
+    ]
+    lines.extend(_fetch_lines(rule_plan, '        '))
+    lines.append('        append(v)')
+    lines.append('    return column')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_rule_source(rule_plan, indent='    '):
+    rule = rule_plan.rule
+    name = rule_plan.name
+    if rule_plan.is_custom:
+        return ['{}{}.get_value_from_context_and_set_to_result(obj, res)'
+                .format(indent, name)]
+
+    lines = _fetch_lines(rule_plan, indent)
+
+    if rule_plan.is_inlined:
+        if rule_plan.converter:
+            lines.append('{}try:'.format(indent))
+            lines.append('{}    v = {}(v)'.format(indent, rule_plan.converter))
+            lines.append('{}except Exception:'.format(indent))
+            lines.append('{}    {}.log_value_error(l)'.format(indent, name))
+            lines.append('{}    raise'.format(indent))
+    else:
+        lines.append('{}try:'.format(indent))
+        lines.append('{}    v = {}_get_value(v)'.format(indent, name))
+        lines.append('{}except _Immediate as e:'.format(indent))
+        lines.append('{}    v = e.result'.format(indent))
+        lines.append('{}except Exception:'.format(indent))
+        lines.append('{}    {}.log_value_error(l)'.format(indent, name))
+        lines.append('{}    raise'.format(indent))
+
+    if rule.default is not None:
+        lines.append('{}if v is None:'.format(indent))
+        lines.append('{}    v = {}.default'.format(indent, name))
+
+    if len(rule_plan.trg_steps) == 1:
+        lines.append('{}res[{}] = v'.format(
+            indent, repr(rule_plan.trg_steps[0])
+        ))
+    else:
+        lines.append('{}_set(res, {}_trg, v)'.format(indent, name))
+
+    return lines
+
+
+def generate_source(rule_plans):
+    lines = [
+        'def serialize(obj, _isinstance=isinstance, _dict=dict, '
+        '_getattr=getattr, _callable=callable):',
+        '    res = {}',
+    ]
+    for rule_plan in rule_plans:
+        lines.extend(generate_rule_source(rule_plan))
+    lines.append('    return res')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_step_source(rule_plan):
+    lines = [
+        'def step(obj, res, _isinstance=isinstance, _dict=dict, '
+        '_getattr=getattr, _callable=callable):',
+    ]
+    lines.extend(generate_rule_source(rule_plan))
+    return '\n'.join(lines) + '\n'
+
+
+def build_namespace(rule_plans):
+    namespace = dict(INLINE_BUILTINS)
+    namespace.update({
+        '_Immediate': fields.ImmediateResultException,
+        '_set': set_by_steps,
+    })
+    for rule_plan in rule_plans:
+        namespace[rule_plan.name] = rule_plan.rule
+        namespace[rule_plan.name + '_get_value'] = rule_plan.rule.get_value
+        namespace[rule_plan.name + '_trg'] = rule_plan.trg_steps
+    return namespace
+
+
+def build_function(source, rule_plans, name):
+    namespace = build_namespace(rule_plans)
+    code = compile(source, '<preparer {}>'.format(name), 'exec')
+    exec code in namespace
+    return namespace[name]
+
+
+def bind_rules(rules, context):
+    """
+    Rules with preparer context applied. Rules without own context are
+    copied, class level rules are never changed.
+    """
+    bound = []
+    for rule in rules:
+        if context and not rule.context:
+            rule = copy.copy(rule)
+            rule.context = context
+        bound.append(rule)
+    return tuple(bound)
+
+
+def get_plan(preparer_class, context=None):
+    """
+    Returns compiled plan for preparer class rules with context applied.
+    Plans are cached on the preparer class per context.
+    """
+    plans = preparer_class._plans
+
+    plan = plans.get(context)
+    if plan is None:
+        plan = Plan(bind_rules(preparer_class._rules, context))
+        plan = plans.setdefault(context, plan)
+    return plan
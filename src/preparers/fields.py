@@ -1,79 +1,16 @@
 import logging
-import operator as op
-import uuid
 
-from collections import defaultdict
 from decimal import Decimal
 
+from ..arrays import to_numbers
+from ..dateformat import get_formatter
 from ..processors import RelatedProcessor, \
     DistinctRelatedProcessor
+from .accessors import Accessor, AccessorsFactory, split_path, set_by_steps
 
 logger = logging.getLogger(__name__)
 
 
-class AccessorsFactory(object):
-    __getters = defaultdict(dict)
-
-    @classmethod
-    def make_getter(cls, path, key, obj, namespace='_'):
-        storage = cls.__getters[namespace]
-        path += '_getter'
-
-        if path in storage:
-            return storage[path]
-
-        if isinstance(obj, dict):
-            getter = op.itemgetter(key)
-        else:
-            getter = op.attrgetter(key)
-
-        storage[path] = getter
-        cls.__getters[namespace] = storage
-        return getter
-
-    @classmethod
-    def resolve_steps(cls, obj, steps, ns=None, force_create=False):
-        current_path = ''
-        res = obj
-        for step in steps:
-            current_path += step
-            try:
-                getter = AccessorsFactory.make_getter(
-                    current_path, step, res, namespace=ns
-                )
-                res = getter(res)
-            except (KeyError, AttributeError):
-                if isinstance(res, dict) and force_create:
-                    res[step] = {}
-                    res = res[step]
-                else:
-                    raise
-        return res
-
-    @classmethod
-    def get_by_path(cls, obj, path, ns=None):
-        if not path:
-            return obj
-
-        steps = path.split('.')
-        res = cls.resolve_steps(obj, steps, ns)
-        return res
-
-    @classmethod
-    def set_by_path(cls, obj, path, value, ns=None):
-        if not path:
-            return obj
-
-        steps = path.split('.')
-        context = cls.resolve_steps(
-            obj, steps[:-1], ns=ns, force_create=True
-        )
-
-        if isinstance(context, dict):
-            context[steps[-1]] = value
-
-        return obj
-
 def field_documentation(rtype=None, is_null=None, choices=None, complex_preparer=None):
     def decorator(func):
 
@@ -95,19 +32,22 @@ def field_documentation(rtype=None, is_null=None, choices=None, complex_preparer
 
 
 class Field(object):
+    __slots__ = ('default', 'context', 'src', 'trg', 'accessors')
+
     def __init__(self, src=None, trg=None, context=None, default=None, **kwargs):
         self.default = default
         self.context = context
         self.src = src
         self.trg = trg
-        self.uuid = unicode(uuid.uuid4())
+        self.accessors = {}
 
     def contribute_to_class(self, name, new_class):
 
-        if hasattr(new_class, '_rules'):
-            rules = new_class._rules or []
+        if '_rules' in new_class.__dict__:
+            rules = new_class._rules
         else:
-            rules = []
+            # copy rules of the base class, so they are not changed
+            rules = list(getattr(new_class, '_rules', None) or [])
 
         if self.src == 'self':
             self.src = None
@@ -125,26 +65,43 @@ class Field(object):
     def get_value(self, value):
         return value
 
-    def set_value(self, res, value):
-        AccessorsFactory.set_by_path(
-            res,
-            self.trg,
-            value,
-            ns=self.uuid
+    def get_values(self, values):
+        """
+        Batch version of get_value, used by Preparer.prepare_many.
+        Subclasses override it when whole column can be converted at once.
+        """
+        result = []
+        for value in values:
+            try:
+                result.append(self.get_value(value))
+            except ImmediateResultException as e:
+                result.append(e.result)
+        return result
+
+    def log_value_error(self, local_context):
+        logger.debug(
+            '{}, {}, {}, {}'.format(
+                self.context,
+                self.src,
+                self.trg,
+                local_context.keys() if isinstance(local_context, dict) else local_context
+            )
         )
 
-    def get_value_from_context_and_set_to_result(self, context_object, res):
-        local_context = AccessorsFactory.get_by_path(
-            context_object,
-            self.context,
-            ns=self.uuid,
-        )
+    def get_accessor(self, path):
+        accessor = self.accessors.get(path)
+        if accessor is None:
+            accessor = Accessor(path)
+            self.accessors[path] = accessor
+        return accessor
 
-        value_to_process = AccessorsFactory.get_by_path(
-            local_context,
-            self.src,
-            ns=self.uuid,
-        )
+    def set_value(self, res, value):
+        if self.trg:
+            set_by_steps(res, split_path(self.trg), value)
+
+    def get_value_from_context_and_set_to_result(self, context_object, res):
+        local_context = self.get_accessor(self.context)(context_object)
+        value_to_process = self.get_accessor(self.src)(local_context)
 
         if hasattr(value_to_process, '__call__'):
             value_to_process = value_to_process()
@@ -154,14 +111,7 @@ class Field(object):
         except ImmediateResultException as e:
             value = e.result
         except Exception:
-            logger.debug(
-                '{}, {}, {}, {}'.format(
-                    self.context,
-                    self.src,
-                    self.trg,
-                    local_context.keys() if isinstance(local_context, dict) else local_context
-                )
-            )
+            self.log_value_error(local_context)
             raise
 
         if value is None and self.default is not None:
@@ -180,6 +130,8 @@ class ImmediateResultException(Exception):
 
 @field_documentation(is_null=True)
 class NullField(Field):
+    __slots__ = ()
+
     def __init__(self, src=None, trg=None, processor=None, context=None,
                  default=None):
         super(NullField, self).__init__(src, trg, processor, context)
@@ -192,24 +144,43 @@ class NullField(Field):
             )
         return context
 
+    def get_not_null_values(self, values, convert):
+        default = self.default
+        return [default if v is None else convert(v) for v in values]
+
 
 @field_documentation(rtype='int')
 class IntField(Field):
+    __slots__ = ()
+
     def get_value(self, context):
         return int(context)
 
+    def get_values(self, values):
+        return map(int, values)
+
 
 @field_documentation(rtype='str')
 class CharField(Field):
+    __slots__ = ()
+
     def get_value(self, context):
         try:
             return unicode(context)
         except UnicodeDecodeError:
             return unicode(context.decode('utf-8'))
 
+    def get_values(self, values):
+        try:
+            return map(unicode, values)
+        except UnicodeDecodeError:
+            return super(CharField, self).get_values(values)
+
 
 @field_documentation(rtype='str')
 class DjangoDisplayPropertyField(Field):
+    __slots__ = ()
+
     def get_value(self, context):
         attr = 'get_{}_display'.format(self.trg)
         return getattr(context, attr)()
@@ -217,6 +188,8 @@ class DjangoDisplayPropertyField(Field):
 
 @field_documentation(rtype='complex')
 class RelatedInstanceField(Field):
+    __slots__ = ('serializer', )
+
     def __init__(self, src=None, trg=None, post_processor=None, context=None,
                  serializer=None):
         super(RelatedInstanceField, self).__init__(
@@ -232,6 +205,8 @@ class RelatedInstanceField(Field):
 
 @field_documentation(rtype='complex')
 class RelatedIterableField(Field):
+    __slots__ = ('serializer', 'distinct')
+
     def __init__(self, src=None, trg=None, post_processor=None, context=None,
                  serializer=None, default=None, distinct=False):
         super(RelatedIterableField, self).__init__(
@@ -240,30 +215,57 @@ class RelatedIterableField(Field):
         self.serializer = serializer
         self.distinct = distinct
 
+    def get_distinct_processor(self):
+        """
+        distinct is True to compare related objects themselves, source path
+        or callable returning a key to compare.
+        """
+        if self.distinct is True:
+            return DistinctRelatedProcessor(self.serializer, fields=())
+        if isinstance(self.distinct, basestring):
+            return DistinctRelatedProcessor(
+                self.serializer,
+                key=self.get_accessor(self.distinct),
+                fields=(self.distinct.replace('.', '__'), )
+            )
+        return DistinctRelatedProcessor(self.serializer, key=self.distinct)
+
     def get_value(self, context):
         if context is None:
             raise ImmediateResultException(result=None)
         if self.distinct:
-            return DistinctRelatedProcessor(self.serializer)(context)
+            return self.get_distinct_processor()(context)
         else:
             return RelatedProcessor(self.serializer)(context)
 
 
 @field_documentation(rtype='decimal')
 class DecimalField(Field):
+    __slots__ = ()
+
     def get_value(self, context):
         return Decimal(context)
 
+    def get_values(self, values):
+        return map(Decimal, values)
+
 
 @field_documentation(rtype='decimal')
 class NullDecimalField(NullField):
+    __slots__ = ()
+
     def get_value(self, context):
         context = super(NullDecimalField, self).get_value(context)
         return Decimal(context)
 
+    def get_values(self, values):
+        return self.get_not_null_values(values, Decimal)
+
 
 @field_documentation(rtype='str')
 class NullCharField(NullField):
+    __slots__ = ()
+
     def get_value(self, context):
         context = super(NullCharField, self).get_value(context)
         try:
@@ -274,25 +276,42 @@ class NullCharField(NullField):
 
 @field_documentation(rtype='int')
 class NullIntField(NullField):
+    __slots__ = ()
+
     def get_value(self, context):
         context = super(NullIntField, self).get_value(context)
         return int(context)
 
+    def get_values(self, values):
+        return self.get_not_null_values(values, int)
+
 
 @field_documentation(rtype='bool')
 class NullBooleanField(NullField):
+    __slots__ = ()
+
     def get_value(self, context):
         context = super(NullBooleanField, self).get_value(context)
         return bool(context)
 
+    def get_values(self, values):
+        return self.get_not_null_values(values, bool)
+
 
 @field_documentation(rtype='bool')
 class BooleanField(Field):
+    __slots__ = ()
+
     def get_value(self, context):
         return bool(context)
 
+    def get_values(self, values):
+        return map(bool, values)
+
 
 class ValueMockField(Field):
+    __slots__ = ('val', )
+
     def __init__(self, val, src=None, trg=None, processor=None, context=None):
         super(ValueMockField, self).__init__(src, trg, processor, context)
         self.val = val
@@ -303,58 +322,94 @@ class ValueMockField(Field):
 
 @field_documentation(rtype='datetime')
 class NullDateTimeField(NullField):
+    __slots__ = ('fmt', 'formatter')
+
     def get_value(self, context):
         context = super(NullDateTimeField, self).get_value(context)
-        return self.fmt.format(context)
+        return self.formatter(context)
 
     def __init__(self, src=None, trg=None, fmt=u'{}', context=None):
         super(NullDateTimeField, self).__init__(src, trg, None, context)
         self.fmt = fmt
+        self.formatter = get_formatter(fmt)
+
+    def get_values(self, values):
+        return self.get_not_null_values(values, self.formatter)
 
 
 @field_documentation(rtype='datetime')
 class DateTimeField(Field):
+    __slots__ = ('fmt', 'formatter')
+
     def get_value(self, context):
-        return self.fmt.format(context)
+        return self.formatter(context)
 
     def __init__(self, src=None, trg=None, fmt=u'{}', context=None):
         super(DateTimeField, self).__init__(src, trg, None, context)
         self.fmt = fmt
+        self.formatter = get_formatter(fmt)
+
+    def get_values(self, values):
+        return map(self.formatter, values)
 
 
 @field_documentation(rtype='datetime')
 class TimeField(Field):
+    __slots__ = ('fmt', 'formatter')
+
     def get_value(self, context):
-        return self.fmt.format(context)
+        return self.formatter(context)
 
     def __init__(self, src=None, trg=None, fmt=u'{:%H:%M}', context=None):
         super(TimeField, self).__init__(src, trg, None, context)
         self.fmt = fmt
+        self.formatter = get_formatter(fmt)
+
+    def get_values(self, values):
+        return map(self.formatter, values)
 
 @field_documentation(rtype='datetime')
 class DateField(Field):
+    __slots__ = ('fmt', 'formatter')
+
     def get_value(self, context):
-        return self.fmt.format(context)
+        return self.formatter(context)
 
     def __init__(self, src=None, trg=None, fmt=u'{:%Y-%m-%d}', context=None):
         super(DateField, self).__init__(src, trg, None, context)
         self.fmt = fmt
+        self.formatter = get_formatter(fmt)
+
+    def get_values(self, values):
+        return map(self.formatter, values)
 
 @field_documentation(rtype='float')
 class FloatField(Field):
+    __slots__ = ()
+
     def get_value(self, context):
         return float(context)
 
+    def get_values(self, values):
+        return map(float, values)
+
 
 @field_documentation(rtype='float')
 class NullFloatField(NullField):
+    __slots__ = ()
+
     def get_value(self, context):
         context = super(NullFloatField, self).get_value(context)
         return float(context)
 
+    def get_values(self, values):
+        return self.get_not_null_values(values, float)
+
 
 @field_documentation(rtype='str')
 class NullDjangoDisplayPropertyField(NullField):
+    __slots__ = ()
+
     def get_value(self, context):
         attr = 'get_{}_display'.format(self.trg)
         return getattr(context, attr)()
@@ -362,8 +417,28 @@ class NullDjangoDisplayPropertyField(NullField):
 
 @field_documentation(rtype='array_float')
 class FloatArrayField(Field):
+    """
+    output is None for a list, 'array' for array.array or 'numpy' for
+    numpy.ndarray.
+    """
+    __slots__ = ('output', )
+
+    typecode = 'd'
+
+    def __init__(self, src=None, trg=None, context=None, default=None,
+                 output=None):
+        super(FloatArrayField, self).__init__(src, trg, context, default)
+        self.output = output
+
     def get_value(self, context):
         if context is None:
             return []
 
-        return map(float, context)
+        return to_numbers(context, self.typecode, self.output)
+
+
+@field_documentation(rtype='array_int')
+class IntArrayField(FloatArrayField):
+    __slots__ = ()
+
+    typecode = 'l'
@@ -0,0 +1,102 @@
+"""
+Parallel preparing of big querysets for exports and feeds.
+
+Primary keys are split into ranges, every range is prepared and encoded to
+JSON by a worker process with its own database connection. Parent process
+only joins encoded chunks in order of primary keys.
+"""
+import multiprocessing
+
+from django.db import connections
+
+CHUNKS_PER_WORKER = 4
+
+
+class EncodedJSON(str):
+    """
+    Already encoded JSON array of prepared objects, can be passed to
+    JsonResponse as is.
+    """
+
+
+# Driver connections inherited from the parent process. They share sockets
+# with the parent, and drivers close sessions when connections are
+# deallocated, so references are kept for the life of the worker.
+_inherited_connections = []
+
+
+def drop_connections():
+    # workers open fresh connections on first query
+    for connection in connections.all():
+        if connection.connection is not None:
+            _inherited_connections.append(connection.connection)
+            connection.connection = None
+
+
+def split_pks(pks, chunks):
+    """
+    Splits sorted primary keys into at most `chunks` (first, last) ranges.
+    """
+    if not pks:
+        return []
+
+    size = max(1, -(-len(pks) // chunks))
+    return [
+        (pks[i], pks[min(i + size, len(pks)) - 1])
+        for i in range(0, len(pks), size)
+    ]
+
+
+def prepare_shard(task):
+    # encoders import preparers, so they are imported when workers run
+    from ..encoders import dumps
+
+    preparer_class, context, fields, model, query, lookups, first, last = task
+
+    queryset = model._default_manager.all()
+    queryset.query = query
+    queryset = queryset.filter(pk__gte=first, pk__lte=last).order_by('pk')
+    if lookups:
+        queryset = queryset.prefetch_related(*lookups)
+
+    preparer = preparer_class(context).project(fields)
+    objects = preparer.prepare_many(queryset)
+    return dumps(objects)[1:-1]
+
+
+def prepare_parallel(preparer, queryset, workers):
+    """
+    Returns EncodedJSON array of objects from queryset ordered by primary
+    key. Preparer class has to be importable by worker processes.
+    """
+    if not queryset.query.can_filter():
+        raise ValueError(
+            'Sliced querysets can not be split by primary key ranges'
+        )
+
+    pks = list(
+        queryset.order_by('pk').values_list('pk', flat=True)
+    )
+    ranges = split_pks(pks, workers * CHUNKS_PER_WORKER)
+
+    query = queryset.query.clone()
+    lookups = list(getattr(queryset, '_prefetch_related_lookups', ()))
+    tasks = [
+        (
+            preparer.__class__, preparer.context, preparer.fields,
+            queryset.model, query, lookups, first, last
+        )
+        for first, last in ranges
+    ]
+
+    pool = multiprocessing.Pool(workers, initializer=drop_connections)
+    try:
+        chunks = [chunk for chunk in pool.imap(prepare_shard, tasks) if chunk]
+        pool.close()
+    except Exception:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    return EncodedJSON('[' + ', '.join(chunks) + ']')
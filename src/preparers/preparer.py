@@ -1,4 +1,13 @@
 # from hotels.api.v3.rest.rules import Rules
+import copy
+
+from . import compiler
+from . import queries
+from . import projection
+from . import parallel
+from . import profiling
+from .cache import get_prepared_cache
+from .rows import Rows
 
 
 class PreparerMetaClass(type):
@@ -21,6 +30,8 @@ class PreparerMetaClass(type):
             if hasattr(attr, 'contribute_to_class'):
                 attr.contribute_to_class(name, new_class)
 
+        new_class._plans = {}
+
         metadata_class = attrs.get('Meta')
 
         if metadata_class:
@@ -43,11 +54,6 @@ class Preparer(object):
             context = self._meta.default_context
         return context
 
-    def apply_context_to_rules(self, context):
-        for r in self._rules:
-            if not r.context:
-                r.context = context
-
     def __init__(self, context=None):
         super(Preparer, self).__init__()
 
@@ -55,15 +61,154 @@ class Preparer(object):
 
         context = context or self.get_default_context()
 
-        if context:
-            self.apply_context_to_rules(context)
-
-        self.rules = self._rules
+        # Plans are immutable and cached on the class per context, so
+        # preparer instances are cheap and can be shared between threads
+        self.context = context
+        self.fields = None
+        self.plan = compiler.get_plan(self.__class__, context)
+        self.rules = self.plan.bound_rules
+        self.cache = get_prepared_cache(self.__class__)
+        if self.cache is not None and self.cache.model is not None:
+            self.cache.connect(self, self.cache.model)
 
     def __call__(self, context_object):
-        res = {}
-        for rule in self.rules:
-            rule.get_value_from_context_and_set_to_result(context_object, res)
-        return res
-
-
+        if self.cache is not None:
+            return self.cache.get_or_prepare(self, context_object)
+        if profiling.enabled:
+            return profiling.serialize(self, self.plan, context_object)
+        return self.plan.serialize(context_object)
+
+    def serialize(self, context_object):
+        """
+        Prepares object bypassing the cache.
+        """
+        if profiling.enabled:
+            return profiling.serialize(self, self.plan, context_object)
+        return self.plan.serialize(context_object)
+
+    def prepare_many(self, context_objects):
+        """
+        Same as [preparer(o) for o in context_objects], but values are
+        fetched and converted column by column.
+        Cached preparers prepare objects one by one, so nested cached
+        preparers can track what was embedded into what.
+        """
+        if self.cache is not None:
+            return [self(o) for o in context_objects]
+        if profiling.enabled:
+            return profiling.serialize_many(self, self.plan, context_objects)
+        return self.plan.serialize_many(context_objects)
+
+    def prepare_parallel_json(self, queryset, workers):
+        """
+        Already encoded JSON array of objects from the queryset, ordered by
+        primary key. Queryset is split by primary key ranges, which are
+        prepared by a pool of `workers` processes. Sliced querysets are
+        not supported.
+
+        :rtype: parallel.EncodedJSON
+        """
+        return parallel.prepare_parallel(self, queryset, workers)
+
+    def prepare_rows(self, context_objects):
+        """
+        Same as prepare_many, but objects are returned as preparers.Rows:
+        tuples of values sharing one schema of target keys. Rows are
+        expanded into dicts only when they are encoded or accessed.
+        Rules overriding `set_value` or
+        `get_value_from_context_and_set_to_result` have no known target
+        keys, preparers with such rules return prepare_many list.
+        """
+        if not self.plan.is_columnar:
+            return self.prepare_many(context_objects)
+        if self.cache is not None or profiling.enabled:
+            return Rows.from_dicts(
+                self.plan.schema, self.prepare_many(context_objects)
+            )
+        return self.plan.serialize_rows(context_objects)
+
+    def get_query_plan(self, model):
+        query_plan = self.plan.query_plans.get(model)
+        if query_plan is None:
+            query_plan = queries.build_query_plan(self, model)
+            self.plan.query_plans[model] = query_plan
+        return query_plan
+
+    def optimize_queryset(self, queryset):
+        """
+        Applies select_related, prefetch_related and only derived from
+        the rules, including nested serializers, to the queryset.
+        """
+        return self.get_query_plan(queryset.model).apply(queryset)
+
+    def get_values_plan(self, model):
+        """
+        Plan which reads values() rows instead of model instances or None,
+        when some rule needs a model instance.
+        """
+        plans = self.plan.values_plans
+        if model not in plans:
+            values_plan = None
+            lookups = queries.get_values_lookups(self, model)
+            if lookups is not None:
+                rules = []
+                for rule, lookup in zip(self.rules, lookups):
+                    rule = copy.copy(rule)
+                    rule.context = None
+                    rule.src = lookup
+                    rules.append(rule)
+                values_plan = compiler.Plan(rules)
+                values_plan.lookups = sorted(set(lookups))
+            plans[model] = values_plan
+        return plans[model]
+
+    def prepare_values(self, queryset):
+        """
+        Same as prepare_many(queryset), but when all rules read plain
+        columns, queryset is evaluated with values() and no model instances
+        are created. Dotted sources become `__` lookups.
+        Cached preparers always prepare model instances.
+        """
+        values_plan = None
+        if self.cache is None:
+            values_plan = self.get_values_plan(queryset.model)
+        if values_plan is None:
+            return self.prepare_many(queryset)
+
+        rows = queryset.values(*values_plan.lookups)
+        if profiling.enabled:
+            return profiling.serialize_many(self, values_plan, rows)
+        return values_plan.serialize_many(rows)
+
+    def project(self, fields):
+        """
+        Returns preparer which renders only requested fields, for example
+        `id,name,address.city`. Nested serializers are projected as well.
+        Unknown fields are ignored. Projections are cached per distinct set
+        of known fields.
+        """
+        if not fields:
+            return self
+
+        fields = projection.filter_paths(
+            self.rules, projection.parse_fields(fields)
+        )
+        projected = self.plan.projections.get(fields)
+        if projected is None:
+            rules = projection.project_rules(
+                self.rules, projection.build_tree(fields)
+            )
+            projected = self.__class__.__new__(self.__class__)
+            projected.context = self.context
+            projected.cache = self.cache
+            projected.fields = fields
+            projected.rules = rules
+            projected.plan = compiler.Plan(rules)
+            self.plan.projections.set(fields, projected)
+        return projected
+
+    def project_request(self, request, param='fields'):
+        """
+        Projection requested with `?fields=` parameter.
+        """
+        return self.project(request.GET.get(param))
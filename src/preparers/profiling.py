@@ -0,0 +1,211 @@
+"""
+Per rule profiling of preparers.
+
+    with Profile(memory=True, hook=send_to_statsd) as profile:
+        HotelPreparer().prepare_many(hotels)
+
+    profile.as_list()  # rules in order of time spent
+
+Rules are identified by preparer class name and target, rules of nested
+preparers are rolled up into the rule of the parent preparer which called
+them. Time includes nested rules. Memory is measured with tracemalloc and
+only when it is importable.
+
+Profiles are active in the thread which opened them. Without an open
+profile preparers run generated code and only check a module flag.
+"""
+import threading
+
+from collections import OrderedDict
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from django.dispatch import Signal
+
+# Sent with a finished profile, can be used to report it to metrics
+profile_finished = Signal(providing_args=['profile'])
+
+# Number of open profiles in all threads
+enabled = 0
+
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_profile():
+    return getattr(_local, 'profile', None)
+
+
+class RuleStats(object):
+    def __init__(self, preparer=None, trg=None):
+        self.preparer = preparer
+        self.trg = trg
+        self.calls = 0
+        self.errors = 0
+        self.time = 0.0
+        self.allocated = None
+        self.children = OrderedDict()
+
+    def child(self, preparer, trg):
+        key = (preparer, trg)
+        stats = self.children.get(key)
+        if stats is None:
+            stats = self.children[key] = RuleStats(preparer, trg)
+        return stats
+
+    def as_dict(self):
+        return {
+            'preparer': self.preparer,
+            'trg': self.trg,
+            'calls': self.calls,
+            'errors': self.errors,
+            'time': self.time,
+            'allocated': self.allocated,
+            'rules': [
+                stats.as_dict() for stats in self.children.values()
+            ],
+        }
+
+
+class Profile(object):
+
+    def __init__(self, memory=False, hook=None):
+        super(Profile, self).__init__()
+        self.memory = memory and tracemalloc is not None
+        self.hook = hook
+        self.root = RuleStats()
+        self.stack = [self.root]
+        self.parent = None
+        self.started_tracing = False
+
+    def __enter__(self):
+        global enabled
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+        self.parent = get_profile()
+        _local.profile = self
+        with _lock:
+            enabled += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global enabled
+
+        with _lock:
+            enabled -= 1
+        _local.profile = self.parent
+
+        if self.started_tracing:
+            tracemalloc.stop()
+
+        if self.hook is not None:
+            self.hook(self)
+        profile_finished.send(sender=self.__class__, profile=self)
+
+    def measure(self, preparer, trg, calls, func, *args):
+        stats = self.stack[-1].child(preparer, trg)
+        self.stack.append(stats)
+
+        if self.memory:
+            allocated = tracemalloc.get_traced_memory()[0]
+        start = default_timer()
+        try:
+            return func(*args)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.time += default_timer() - start
+            stats.calls += calls
+            if self.memory:
+                stats.allocated = (stats.allocated or 0) + \
+                    tracemalloc.get_traced_memory()[0] - allocated
+            self.stack.pop()
+
+    def as_dict(self):
+        """
+        Tree of measured rules, nested preparers are under `rules`.
+        """
+        return [stats.as_dict() for stats in self.root.children.values()]
+
+    def as_list(self):
+        """
+        Rules of all levels summed by preparer and target, slowest first.
+        Time of a rule includes time of its nested rules.
+        """
+        totals = OrderedDict()
+        nodes = list(self.root.children.values())
+        while nodes:
+            stats = nodes.pop(0)
+            nodes.extend(stats.children.values())
+
+            key = (stats.preparer, stats.trg)
+            total = totals.get(key)
+            if total is None:
+                total = totals[key] = RuleStats(*key)
+            total.calls += stats.calls
+            total.errors += stats.errors
+            total.time += stats.time
+            if stats.allocated is not None:
+                total.allocated = (total.allocated or 0) + stats.allocated
+
+        result = []
+        for total in totals.values():
+            item = total.as_dict()
+            del item['rules']
+            result.append(item)
+        return sorted(result, key=lambda item: -item['time'])
+
+
+def serialize(preparer, plan, obj):
+    """
+    plan.serialize(obj) with every rule measured by the current profile.
+    Rules run the same generated code, one function per rule.
+    """
+    profile = get_profile()
+    if profile is None:
+        return plan.serialize(obj)
+
+    name = preparer.__class__.__name__
+    res = {}
+    for rule_plan in plan.rules:
+        profile.measure(
+            name, rule_plan.rule.trg, 1, rule_plan.step, obj, res
+        )
+    return res
+
+
+def serialize_many(preparer, plan, objects):
+    """
+    plan.serialize_many(objects) with every column measured by the current
+    profile.
+    """
+    profile = get_profile()
+    if profile is None:
+        return plan.serialize_many(objects)
+    if not plan.is_columnar:
+        return [serialize(preparer, plan, obj) for obj in objects]
+
+    if not isinstance(objects, list):
+        objects = list(objects)
+
+    name = preparer.__class__.__name__
+    try:
+        columns = [
+            profile.measure(
+                name, rule_plan.rule.trg, len(objects),
+                plan.get_column, rule_plan, objects
+            )
+            for rule_plan in plan.rules
+        ]
+    except Exception:
+        # calls and the error are already counted by the failed column
+        return map(plan.serialize, objects)
+    return plan.build_rows(objects, columns)
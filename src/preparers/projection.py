@@ -0,0 +1,104 @@
+import copy
+
+
+def parse_fields(fields):
+    """
+    Normalizes `id,name,address.city` or an iterable of paths into a sorted
+    tuple of unique paths, which is used as a key of cached projections.
+    """
+    if isinstance(fields, basestring):
+        fields = fields.split(',')
+
+    paths = set()
+    for path in fields:
+        path = path.strip().strip('.')
+        if path:
+            paths.add(path)
+    return tuple(sorted(paths))
+
+
+def is_known_path(rules, path):
+    """
+    True when path is a target of the rules, a part of one, or a path
+    inside a target rendered by a nested serializer.
+    """
+    steps = path.split('.')
+    for rule in rules:
+        trg_steps = rule.trg.split('.')
+        common = min(len(steps), len(trg_steps))
+        if steps[:common] != trg_steps[:common]:
+            continue
+        if len(steps) <= len(trg_steps):
+            return True
+
+        serializer = getattr(rule, 'serializer', None)
+        if hasattr(serializer, 'rules') and is_known_path(
+                serializer.rules, '.'.join(steps[common:])):
+            return True
+    return False
+
+
+def filter_paths(rules, paths):
+    """
+    Drops unknown paths, so arbitrary requested fields don't create new
+    projections.
+    """
+    return tuple(path for path in paths if is_known_path(rules, path))
+
+
+def build_tree(paths):
+    """
+    ('id', 'address.city') -> {'id': {}, 'address': {'city': {}}}
+    Empty dict means that the whole value is requested.
+    """
+    tree = {}
+    for path in paths:
+        node = tree
+        steps = path.split('.')
+        for step in steps[:-1]:
+            if node.get(step) == {} and step in node:
+                # whole value is already requested
+                break
+            node = node.setdefault(step, {})
+        else:
+            node[steps[-1]] = {}
+    return tree
+
+
+def get_paths(tree, prefix=''):
+    paths = []
+    for name, node in tree.items():
+        path = prefix + name
+        if node:
+            paths.extend(get_paths(node, path + '.'))
+        else:
+            paths.append(path)
+    return tuple(sorted(paths))
+
+
+def project_rules(rules, tree):
+    """
+    Returns rules needed to render fields from the tree. Rules with nested
+    serializers are copied with projected serializer.
+    """
+    projected = []
+    for rule in rules:
+        node = tree
+        for step in rule.trg.split('.'):
+            if step not in node:
+                node = None
+                break
+            node = node[step]
+            if not node:
+                break
+
+        if node is None:
+            continue
+
+        serializer = getattr(rule, 'serializer', None)
+        if node and hasattr(serializer, 'project'):
+            rule = copy.copy(rule)
+            rule.serializer = serializer.project(get_paths(node))
+
+        projected.append(rule)
+    return projected
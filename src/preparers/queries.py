@@ -0,0 +1,187 @@
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.fields.subclassing import SubfieldBase
+
+from . import fields
+
+LOOKUP_SEP = '__'
+
+
+def get_reverse_relation(opts, name):
+    related_objects = opts.get_all_related_objects() + \
+        opts.get_all_related_many_to_many_objects()
+    for related in related_objects:
+        if related.get_accessor_name() == name:
+            return related
+    return None
+
+
+def get_field_info(model, name):
+    """
+    Returns (field name, related model, is multiple, is column) for
+    attribute name on model or None when name is not a model field
+    (property, method, etc.)
+    """
+    opts = model._meta
+
+    related = get_reverse_relation(opts, name)
+    if related is not None:
+        return name, related.model, not related.field.unique, False
+
+    try:
+        field, _, direct, m2m = opts.get_field_by_name(name)
+    except FieldDoesNotExist:
+        for field in opts.fields:
+            if field.attname == name:
+                return field.name, None, False, True
+        return None
+
+    if not direct:
+        return None
+
+    rel = getattr(field, 'rel', None)
+    if rel is None:
+        return field.name, None, False, True
+
+    return field.name, rel.to, m2m, not m2m
+
+
+class QueryPlan(object):
+    """
+    select_related, prefetch_related and only lookups needed by a preparer.
+    Columns are collected only for models joined with select_related,
+    prefetched models are loaded completely.
+    """
+
+    def __init__(self, model):
+        super(QueryPlan, self).__init__()
+        self.model = model
+        self.select_related = set()
+        self.prefetch_related = set()
+        self.only = set()
+        self.complete = set()
+
+    def add_column(self, prefix, name):
+        self.only.add(LOOKUP_SEP.join(prefix + (name, )))
+
+    def add_all_columns(self, model, prefix):
+        self.complete.add(prefix)
+        for field in model._meta.fields:
+            self.add_column(prefix, field.name)
+
+    def add_preparer(self, preparer, model, prefix=(), prefetched=False):
+        for rule_plan in preparer.plan.rules:
+            self.add_rule(
+                rule_plan, model, prefix, prefetched
+            )
+
+    def add_rule(self, rule_plan, model, prefix, prefetched):
+        rule = rule_plan.rule
+        steps = rule_plan.context_steps + rule_plan.src_steps
+
+        if rule_plan.is_custom:
+            # custom hooks can read anything
+            if not prefetched:
+                self.add_all_columns(model, prefix)
+            return
+
+        for step in steps:
+            info = get_field_info(model, step)
+            if info is None:
+                # property or method, it can read any column
+                if not prefetched:
+                    self.add_all_columns(model, prefix)
+                return
+
+            name, related_model, is_multiple, is_column = info
+            if related_model is None:
+                if not prefetched:
+                    self.add_column(prefix, name)
+                return
+
+            lookup = LOOKUP_SEP.join(prefix + (name, ))
+            if is_multiple or prefetched:
+                self.prefetch_related.add(lookup)
+                prefetched = True
+            else:
+                self.select_related.add(lookup)
+                if is_column:
+                    self.add_column(prefix, name)
+
+            prefix += (name, )
+            model = related_model
+
+        serializer = getattr(rule, 'serializer', None)
+        if serializer is not None and hasattr(serializer, 'plan'):
+            self.add_preparer(serializer, model, prefix, prefetched)
+        elif isinstance(rule, fields.DjangoDisplayPropertyField):
+            if not prefetched:
+                self.add_column(prefix, rule.trg)
+        elif not prefetched:
+            # model instance itself is passed to the field
+            self.add_all_columns(model, prefix)
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(
+                *sorted(self.prefetch_related)
+            )
+        if self.only and () not in self.complete:
+            queryset = queryset.only(*sorted(self.only))
+        return queryset
+
+
+def build_query_plan(preparer, model):
+    query_plan = QueryPlan(model)
+    query_plan.add_preparer(preparer, model)
+    return query_plan
+
+
+def get_column_lookup(model, steps):
+    """
+    Returns values() lookup for steps, when they end in a plain column
+    reached through forward foreign keys, otherwise None.
+    """
+    names = []
+    for index, step in enumerate(steps):
+        info = get_field_info(model, step)
+        if info is None:
+            return None
+
+        name, related_model, is_multiple, is_column = info
+        names.append(name)
+        if related_model is None:
+            field = model._meta.get_field(name)
+            if index != len(steps) - 1 or isinstance(type(field), SubfieldBase):
+                # value is converted by the model or used further
+                return None
+            return LOOKUP_SEP.join(names)
+
+        if is_multiple or not is_column:
+            return None
+        model = related_model
+    return None
+
+
+def get_values_lookups(preparer, model):
+    """
+    values() lookups for every rule of the preparer or None when any rule
+    needs a model instance: related serializers, display properties,
+    properties, methods and rules with custom hooks.
+    """
+    lookups = []
+    for rule_plan in preparer.plan.rules:
+        rule = rule_plan.rule
+        if rule_plan.is_custom or \
+                getattr(rule, 'serializer', None) is not None or \
+                isinstance(rule, fields.DjangoDisplayPropertyField):
+            return None
+
+        lookup = get_column_lookup(
+            model, rule_plan.context_steps + rule_plan.src_steps
+        )
+        if lookup is None:
+            return None
+        lookups.append(lookup)
+    return lookups
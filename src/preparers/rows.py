@@ -0,0 +1,61 @@
+from itertools import izip
+
+from .accessors import set_by_steps
+
+
+def get_by_steps(obj, steps):
+    for step in steps:
+        if obj is None:
+            return None
+        obj = obj.get(step)
+    return obj
+
+
+class Rows(object):
+    """
+    Prepared objects stored as tuples of values, keys are kept once in the
+    schema of target paths. Iteration and indexing give dicts, JSON encoder
+    expands rows while the response is written.
+    """
+    __slots__ = ('schema', 'rows', 'keys')
+
+    def __init__(self, schema, rows):
+        self.schema = schema
+        self.rows = rows
+
+        # flat schema is expanded with dict(zip()), which is much faster
+        self.keys = None
+        if all(len(steps) == 1 for steps in schema) and \
+                len(set(schema)) == len(schema):
+            self.keys = tuple(steps[0] for steps in schema)
+
+    @classmethod
+    def from_dicts(cls, schema, objects):
+        return cls(schema, [
+            tuple(get_by_steps(obj, steps) for steps in schema)
+            for obj in objects
+        ])
+
+    def expand_row(self, row):
+        if self.keys is not None:
+            return dict(izip(self.keys, row))
+
+        res = {}
+        for steps, value in izip(self.schema, row):
+            set_by_steps(res, steps, value)
+        return res
+
+    def expand(self):
+        return map(self.expand_row, self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        for row in self.rows:
+            yield self.expand_row(row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Rows(self.schema, self.rows[index])
+        return self.expand_row(self.rows[index])
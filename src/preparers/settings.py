@@ -0,0 +1,19 @@
+from django.conf import settings
+
+# Max number of (source type, path) getters kept in the shared accessor cache
+ACCESSOR_CACHE_SIZE = getattr(settings, 'REST_ACCESSOR_CACHE_SIZE', 1024)
+
+# Number of source types remembered by a single accessor call site before
+# it falls back to the shared cache
+ACCESSOR_INLINE_CACHE_SIZE = getattr(
+    settings, 'REST_ACCESSOR_INLINE_CACHE_SIZE', 4
+)
+
+# Max number of prepared objects kept in process by each cached preparer
+PREPARED_CACHE_SIZE = getattr(settings, 'REST_PREPARED_CACHE_SIZE', 10000)
+
+# Default lifetime of cached prepared objects, in seconds
+PREPARED_CACHE_TIMEOUT = getattr(settings, 'REST_PREPARED_CACHE_TIMEOUT', 300)
+
+# Max number of distinct `?fields=` projections kept by each preparer plan
+PROJECTION_CACHE_SIZE = getattr(settings, 'REST_PROJECTION_CACHE_SIZE', 64)
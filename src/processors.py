@@ -1,3 +1,7 @@
+from django.db import connections
+from django.db.models.query import QuerySet
+
+
 class Processor(object):
 
     def __call__(self, context):
@@ -10,6 +14,10 @@ class ListProcessor(Processor):
         self.rules = rules
 
     def __call__(self, context):
+        prepare_many = getattr(self.rules, 'prepare_many', None)
+        if prepare_many is not None:
+            return prepare_many(context)
+
         res = []
         for item in context:
             res.append(self.rules(item))
@@ -17,9 +25,51 @@ class ListProcessor(Processor):
 
 
 class DistinctListProcessor(ListProcessor):
+    """
+    Skips items with already seen key before they are serialized.
+    Order of items is kept. Without key model instances of a QuerySet are
+    compared themselves, other items may be unhashable or serialized to
+    the same value, so their serialized values are compared instead.
+    """
+    def __init__(self, rules, key=None):
+        super(DistinctListProcessor, self).__init__(rules)
+        self.key = key
+
+    def unique(self, context):
+        key = self.key
+        seen = set()
+        result = []
+        for item in context:
+            item_key = item if key is None else key(item)
+            if item_key not in seen:
+                seen.add(item_key)
+                result.append(item)
+        return result
+
+    def unique_values(self, values):
+        seen = set()
+        unhashable = []
+        result = []
+        for value in values:
+            try:
+                if value in seen:
+                    continue
+                seen.add(value)
+            except TypeError:
+                if value in unhashable:
+                    continue
+                unhashable.append(value)
+            result.append(value)
+        return result
+
     def __call__(self, context):
-        result = super(DistinctListProcessor, self).__call__(context)
-        return set(result)
+        if self.key is None and not isinstance(context, QuerySet):
+            return self.unique_values(
+                super(DistinctListProcessor, self).__call__(context)
+            )
+        return super(DistinctListProcessor, self).__call__(
+            self.unique(context)
+        )
 
 
 class RelatedProcessor(ListProcessor):
@@ -31,8 +81,42 @@ class RelatedProcessor(ListProcessor):
 
 
 class DistinctRelatedProcessor(DistinctListProcessor):
+    """
+    When related objects are not fetched yet, distinct is done by database:
+    DISTINCT when items are compared themselves, DISTINCT ON (fields) when
+    backend supports it and it doesn't change order of items.
+    """
+    def __init__(self, rules, key=None, fields=None):
+        super(DistinctRelatedProcessor, self).__init__(rules, key)
+        self.fields = fields
+
+    def can_distinct_in_database(self, queryset):
+        if self.fields is None or not isinstance(queryset, QuerySet):
+            return False
+
+        if queryset._result_cache is not None:
+            # prefetched, new query would be made
+            return False
+
+        if not self.fields:
+            return True
+
+        connection = connections[queryset.db]
+        if not connection.features.can_distinct_on_fields:
+            return False
+
+        ordering = list(queryset.query.order_by)
+        if not ordering and queryset.query.default_ordering:
+            ordering = list(queryset.model._meta.ordering)
+        return not ordering or \
+            ordering[:len(self.fields)] == list(self.fields)
+
     def __call__(self, context):
         if hasattr(context, 'all'):
-            return super(DistinctRelatedProcessor, self).__call__(context.all())
-        else:
-            return super(DistinctRelatedProcessor, self).__call__(context)
\ No newline at end of file
+            context = context.all()
+
+        if self.can_distinct_in_database(context):
+            return ListProcessor.__call__(
+                self, context.distinct(*self.fields)
+            )
+        return super(DistinctRelatedProcessor, self).__call__(context)
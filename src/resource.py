@@ -1,20 +1,101 @@
 # coding=utf-8
 import logging
 
+from . import compression
+from . import conditional
+from . import negotiation
+from . import pagination
 from .default_error_responses import \
     NotImplementedResponse, \
+    MethodNotAllowedResponse, \
     InternalServerErrorResponse
 from .errors import UserDefinedApiException
 from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import curry
 
 log = logging.getLogger(__name__)
 
+# (HTTP method, is element) -> (dispatch key, handler name)
+HANDLERS = {
+    ('GET', True): ('get_element', 'read_element'),
+    ('GET', False): ('get_list', 'read_list'),
+
+    # body is removed by django handler
+    ('HEAD', True): ('get_element', 'read_element'),
+    ('HEAD', False): ('get_list', 'read_list'),
+
+    ('PUT', True): ('put_element', 'update_element'),
+    ('PUT', False): ('put_list', 'update'),
+
+    ('DELETE', True): ('delete_element', 'delete'),
+    ('DELETE', False): ('delete_list', 'delete'),
+
+    ('POST', True): ('post_element', 'create_element'),
+    ('POST', False): ('post_list', 'create_list'),
+
+    ('PATCH', True): ('patch_element', 'update_partial_element'),
+    ('PATCH', False): ('patch_list', 'update_partial_list'),
+}
+
+
+def not_implemented(method):
+    """
+    Marks handler of Resource, which subclasses have to override to
+    support the HTTP method.
+    """
+    method.not_implemented = True
+    return method
+
+
+class ResourceMetaClass(type):
+    def __new__(cls, name, bases, attrs):
+        new_class = super(ResourceMetaClass, cls).__new__(
+            cls, name, bases, attrs
+        )
+
+        # (HTTP method, is element) -> (dispatch key, handler name) of
+        # handlers overridden by the class
+        new_class.dispatch_table = dict(
+            (key, handler) for key, handler in HANDLERS.items()
+            if not getattr(
+                getattr(new_class, handler[1]), 'not_implemented', False
+            )
+        )
+        # is element -> Allow header
+        new_class.allowed_methods = dict(
+            (element, ', '.join(sorted(
+                method for method, is_element in new_class.dispatch_table
+                if is_element == element
+            )))
+            for element in (True, False)
+        )
+        # (HTTP method, is element) -> body of 405 response
+        new_class.method_not_allowed_bodies = {}
+        return new_class
+
 
 class Resource(object):
+    __metaclass__ = ResourceMetaClass
+
+    # ETags derived from get_*_version are weak, since versions usually
+    # don't change when representation changes, for example on deploy
+    weak_etags = True
+
+    # pagination.KeysetPaginator used by paginate, ordered by pk if None
+    paginator = None
+
+    # {dispatch key: response_cache.ResponseCache} for GET dispatch keys
+    response_cache = {}
+
+    # {dispatch key: coalescing.SingleFlight} for GET dispatch keys
+    single_flight = {}
 
     def __init__(self):
         super(Resource, self).__init__()
 
+    @not_implemented
     def create_element(self, request, *args, **kwargs):
         """
 
@@ -25,6 +106,7 @@ class Resource(object):
         """
         raise NotImplementedError()
 
+    @not_implemented
     def create_list(self, request, *args, **kwargs):
         """
 
@@ -35,6 +117,7 @@ class Resource(object):
         """
         raise NotImplementedError()
 
+    @not_implemented
     def read_list(self, request, *args, **kwargs):
         """
 
@@ -45,6 +128,7 @@ class Resource(object):
         """
         raise NotImplementedError()
 
+    @not_implemented
     def read_element(self, request, *args, **kwargs):
         """
 
@@ -55,9 +139,70 @@ class Resource(object):
         """
         raise NotImplementedError()
 
+    def get_element_version(self, request, *args, **kwargs):
+        """
+        Cheap version of the element, for example its `updated_at`. When it
+        is not None, conditional GET is answered with 304 before
+        read_element is called. Datetime versions are sent as
+        Last-Modified as well. By default ETag is a hash of the body.
+
+        :param request:
+        :type request: django.http.HttpRequest
+        """
+        return None
+
+    def get_list_version(self, request, *args, **kwargs):
+        """
+        Cheap version of the list, for example `max(updated_at)` and count.
+        Same as get_element_version, but for read_list.
+
+        :param request:
+        :type request: django.http.HttpRequest
+        """
+        return None
+
+    def read_conditional(self, request, method, dispatch_key, *args,
+                         **kwargs):
+        version_method = getattr(self, '{}_version'.format(dispatch_key))
+        version = version_method(request, *args, **kwargs)
+
+        etag = last_modified = None
+        if version is not None:
+            etag = conditional.make_etag(
+                dispatch_key, request.get_full_path(),
+                negotiation.get_renderer().format, version,
+                weak=self.weak_etags
+            )
+            last_modified = conditional.get_last_modified(version)
+            if conditional.is_not_modified(request, etag, last_modified):
+                return conditional.not_modified(etag, last_modified)
+
+        response = method(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+        if etag is None:
+            etag = response.get('ETag') or conditional.get_body_etag(response)
+            if conditional.is_not_modified(request, etag, None):
+                return conditional.not_modified(etag, None)
+
+        return conditional.set_headers(response, etag, last_modified)
+
+    def paginate(self, request, queryset):
+        """
+        Page of the queryset requested with `?cursor=` and `?limit=`, its
+        meta can be passed to JsonResponseWithMetadata.
+
+        :rtype: pagination.Page
+        """
+        paginator = self.paginator or pagination.KeysetPaginator()
+        return paginator.paginate(request, queryset)
+
+    @not_implemented
     def update_partial_element(self, request, *args, **kwargs):
         raise NotImplementedError()
 
+    @not_implemented
     def update_partial_list(self, request, *args, **kwargs):
         """
 
@@ -68,6 +213,7 @@ class Resource(object):
         """
         raise NotImplementedError()
 
+    @not_implemented
     def update_element(self, request, *args, **kwargs):
         """
 
@@ -78,6 +224,7 @@ class Resource(object):
         """
         raise NotImplementedError()
 
+    @not_implemented
     def update(self, request, *args, **kwargs):
         """
 
@@ -88,6 +235,7 @@ class Resource(object):
         """
         raise NotImplementedError()
 
+    @not_implemented
     def delete(self, request, *args, **kwargs):
         """
 
@@ -98,35 +246,87 @@ class Resource(object):
         """
         raise NotImplementedError()
 
+    def get_dispatch_option(self, options, dispatch_key):
+        """
+        Response cache or single flight for dispatch key, named after the
+        resource when they have no name.
+        """
+        option = options.get(dispatch_key)
+        if option is not None and option.name is None:
+            option.name = u'{}.{}.{}'.format(
+                type(self).__module__, type(self).__name__, dispatch_key
+            )
+        return option
+
+    def get_dispatch_key(self, request, identity=None):
+        element = bool(identity)
+        handler = HANDLERS.get((request.method, element))
+        if handler is not None:
+            return handler[0]
+        if element:
+            return '{}_element'.format(request.method.lower())
+        return '{}_list'.format(request.method.lower())
+
+    def method_not_allowed(self, request, element):
+        """
+        405 response with Allow header, its body is rendered once per
+        class and method. Like other errors it is always JSON.
+        """
+        key = (request.method, element)
+        allow = self.allowed_methods[element]
+        content = self.method_not_allowed_bodies.get(key)
+        if content is None:
+            content = MethodNotAllowedResponse(
+                method=request.method, allow=allow or u'none'
+            ).content
+            self.method_not_allowed_bodies[key] = content
+
+        response = HttpResponse(
+            content, status=405,
+            content_type=negotiation.JSON.content_type
+        )
+        response['Allow'] = allow
+        return response
+
     def __call__(self, request, identity=None, *args, **kwargs):
-        def default(*args, **kwargs):
-            raise NotImplementedError()
+        renderer = negotiation.select_renderer(request)
+
+        def respond(request):
+            with negotiation.activate(renderer):
+                response = self.dispatch(request, identity, *args, **kwargs)
 
-        methods = {
-            'get_element': self.read_element,
-            'get_list': self.read_list,
+            patch_vary_headers(response, ('Accept', ))
+            return compression.compress_response(request, response)
 
-            'put_element': self.update_element,
-            'put_list': self.update,
+        dispatch_key = self.get_dispatch_key(request, identity)
+        flight = self.get_dispatch_option(self.single_flight, dispatch_key)
+        if flight is not None:
+            respond = curry(
+                flight.get_response, dispatch_key=dispatch_key,
+                renderer=renderer, respond=respond
+            )
 
-            'delete_element': self.delete,
-            'delete_list': self.delete,
+        cache = self.get_dispatch_option(self.response_cache, dispatch_key)
+        if cache is None:
+            return respond(request)
+        return cache.get_response(request, dispatch_key, renderer, respond)
 
-            'post_element': self.create_element,
-            'post_list': self.create_list,
+    def dispatch(self, request, identity=None, *args, **kwargs):
+        element = bool(identity)
+        handler = self.dispatch_table.get((request.method, element))
+        if handler is None:
+            return self.method_not_allowed(request, element)
 
-            'patch_element': self.update_partial_element,
-            'patch_list': self.update_partial_list,
-        }
-        request_method = request.method.lower()
+        dispatch_key, handler_name = handler
+        method = getattr(self, handler_name)
         if identity:
             kwargs['identity'] = identity
-            dispatch_key = '{}_element'.format(request_method)
-        else:
-            dispatch_key = '{}_list'.format(request_method)
 
-        method = methods.get(dispatch_key, default)
         try:
+            if request.method in ('GET', 'HEAD'):
+                return self.read_conditional(
+                    request, method, dispatch_key, *args, **kwargs
+                )
             result = method(request, *args, **kwargs)
             return result
         except UserDefinedApiException as e:
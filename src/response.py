@@ -1,10 +1,14 @@
-import decimal
-import datetime
-import json
+import re
 
-from django.http import HttpResponse
+from itertools import islice
+from string import Formatter
+
+from django.db.models.query import prefetch_related_objects
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils.functional import curry
 
+from . import encoders
+from . import negotiation
 from .errors import UserDefinedApiException
 
 
@@ -24,14 +28,120 @@ class UnknownErrorCode(Exception):
         super(UnknownErrorCode, self).__init__()
 
 
+LAYOUT_MARKER = re.compile(r'"\\u0000(\w+)\\u0000"')
+
+
+def compile_layout(content):
+    """
+    Encodes content with u'\\x00name\\x00' marker strings and splits it into
+    [literal, name, literal, ...], so it can be rendered with render_layout
+    without encoding the literal parts again.
+    """
+    return LAYOUT_MARKER.split(encoders.dumps(content))
+
+
+def render_layout(layout, values):
+    return ''.join([
+        values[piece] if i % 2 else piece
+        for i, piece in enumerate(layout)
+    ])
+
+
+class ErrorTemplate(object):
+    """
+    Error message compiled once per code. Literal parts of the message and
+    of the body are encoded once, only interpolated values are escaped
+    when an error is rendered. Body of an error without parameters is
+    encoded only once.
+    """
+
+    def __init__(self, code, message, status):
+        super(ErrorTemplate, self).__init__()
+        self.code = code
+        self.message = message
+        self.status = status
+        self.formatter = Formatter()
+
+        self.parts = None
+        try:
+            parsed = list(self.formatter.parse(message))
+        except ValueError:
+            parsed = None
+        if parsed is not None and \
+                not any(spec and '{' in spec for _, _, spec, _ in parsed):
+            self.parts = [
+                (self.escape(literal), field_name, spec, conversion)
+                for literal, field_name, spec, conversion in parsed
+            ]
+
+        self.body_layout = None
+        self.error_layout = None
+        self.static_body = None
+
+    def escape(self, text):
+        return encoders.dumps(text)[1:-1]
+
+    def format_message(self, params):
+        if self.parts is None:
+            return self.escape(self.message.format(**params))
+
+        formatter = self.formatter
+        result = []
+        for literal, field_name, spec, conversion in self.parts:
+            result.append(literal)
+            if field_name is None:
+                continue
+            value, _ = formatter.get_field(field_name, (), params)
+            value = formatter.convert_field(value, conversion)
+            result.append(
+                self.escape(self.message[:0] + format(value, spec))
+            )
+        return ''.join(result)
+
+    def render_error(self, params):
+        if self.error_layout is None:
+            self.error_layout = compile_layout({
+                'message': u'\x00message\x00',
+                'meta': u'\x00meta\x00',
+            })
+        return render_layout(self.error_layout, {
+            'message': '"' + self.format_message(params) + '"',
+            'meta': encoders.dumps(params),
+        })
+
+    def render(self, params):
+        if not params and self.static_body is not None:
+            return self.static_body
+
+        if 'errors' in params:
+            errors = map(self.render_error, params['errors'])
+        else:
+            errors = [self.render_error(params)]
+
+        if self.body_layout is None:
+            self.body_layout = compile_layout({
+                'errors': u'\x00errors\x00',
+                'code': self.code,
+            })
+        body = render_layout(self.body_layout, {
+            'errors': '[' + ', '.join(errors) + ']',
+        })
+
+        if not params:
+            self.static_body = body
+        return body
+
+
 class ErrorCodeRegistry(object):
     __registry = {}
+    __templates = {}
 
     @classmethod
     def add(cls, code, message, status_code):
         if code in cls.__registry:
             raise ErrorAlreadyRegisteredCode(code)
         cls.__registry[code] = (message, status_code)
+        cls.__templates[code] = ErrorTemplate(code, message, status_code)
 
     @classmethod
     def get(cls, code):
@@ -40,74 +150,127 @@ class ErrorCodeRegistry(object):
 
         return cls.__registry.get(code)
 
+    @classmethod
+    def get_template(cls, code):
+        if code not in cls.__templates:
+            raise UnknownErrorCode(code)
+
+        return cls.__templates[code]
+
 
-def default_callback(value):
-    types = {
-        decimal.Decimal: lambda v: float('{:0.2f}'.format(v)),
-        datetime.datetime: lambda v: '{:%Y-%m-%dT%H-%M-%S}'.format(v),
-        datetime.date: lambda v: '{:%Y-%m-%d}'.format(v),
-        datetime.time: lambda v: '{:%H:%M:%S}'.format(v),
-        set: lambda v: list(v),
-    }
-    return types.get(type(value), lambda v: None)(value)
+# JSON `default` used by responses, see encoders.register
+default_callback = encoders.registry
 
 
 class JsonResponse(HttpResponse):
+    """
+    Content is encoded with renderer negotiated by Resource, JSON unless
+    client asked for MessagePack. Strings are sent as already encoded JSON.
+    """
     def __init__(self, content=None, mimetype=None, status=None):
         if content is None:
             content = []
 
+        content_type = negotiation.JSON.content_type
         if not isinstance(content, basestring):
-            content = json.dumps(content, default=default_callback)
+            renderer = negotiation.get_renderer()
+            content = renderer.dumps(content)
+            content_type = renderer.content_type
 
         super(JsonResponse, self).__init__(
             content,
             mimetype,
             status,
-            'application/json'
+            content_type
         )
 
 
 class JsonResponseWithMetadata(JsonResponse):
     def __init__(self, objects=None, meta=None):
+        if objects is None:
+            objects = []
+
         default_meta = {
             'page': 1,
             'count': len(objects),
             'limit': len(objects)
         }
         content = {
-            'objects': [] if objects is None else objects,
+            'objects': objects,
             'meta': meta or default_meta
         }
         super(JsonResponseWithMetadata, self).__init__(content)
 
 
-class ErrorResponse(JsonResponse):
-    def __init__(self, code, **kwargs):
-        message, status = ErrorCodeRegistry.get(code)
-
-        errors = []
-        if 'errors' in kwargs:
-            for error in kwargs['errors']:
-                errors.append(
-                    {
-                        'message': message.format(**error),
-                        'meta': error
-                    }
-                )
+class StreamingJsonResponse(StreamingHttpResponse):
+    """
+    Streams {"objects": [...], "meta": {...}} envelope for a queryset.
+    Objects are read with QuerySet.iterator() and prepared chunk by chunk,
+    so neither queryset cache nor the whole list of prepared objects is
+    held in memory. Meta is written after the objects, because count is
+    known only at the end.
+    """
+    chunk_size = 500
+
+    def __init__(self, queryset, preparer, meta=None, status=None,
+                 chunk_size=None):
+        self.chunk_size = chunk_size or self.chunk_size
+        super(StreamingJsonResponse, self).__init__(
+            self.generate(queryset, preparer, meta),
+            status=status,
+            content_type='application/json'
+        )
+
+    def iter_chunks(self, queryset):
+        if hasattr(queryset, 'iterator'):
+            iterator = queryset.iterator()
         else:
-            errors.append(
-                {
-                    'message': message.format(**kwargs),
-                    'meta': kwargs
-                }
-            )
+            iterator = iter(queryset)
 
-        content = {
-            "errors": errors,
-            "code": code
+        prefetch_lookups = getattr(queryset, '_prefetch_related_lookups', None)
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            if prefetch_lookups:
+                # iterator() skips prefetch_related, so do it per chunk
+                prefetch_related_objects(chunk, list(prefetch_lookups))
+            yield chunk
+
+    def get_meta(self, count):
+        return {
+            'page': 1,
+            'count': count,
+            'limit': count
         }
-        super(ErrorResponse, self).__init__(content=content, status=status)
+
+    def generate(self, queryset, preparer, meta):
+        prepare_many = getattr(preparer, 'prepare_many', None)
+
+        yield '{"objects": ['
+        count = 0
+        for chunk in self.iter_chunks(queryset):
+            if prepare_many is not None:
+                objects = prepare_many(chunk)
+            else:
+                objects = [preparer(o) for o in chunk]
+
+            if count:
+                yield ', '
+            yield encoders.dumps(objects)[1:-1]
+            count += len(objects)
+
+        yield '], "meta": '
+        yield encoders.dumps(meta or self.get_meta(count))
+        yield '}'
+
+
+class ErrorResponse(JsonResponse):
+    def __init__(self, code, **kwargs):
+        template = ErrorCodeRegistry.get_template(code)
+        super(ErrorResponse, self).__init__(
+            content=template.render(kwargs), status=template.status
+        )
 
     @classmethod
     def build_new(cls, code, message, status):
@@ -0,0 +1,337 @@
+"""
+Opt-in cache of whole responses to GET requests.
+
+    class HotelResource(Resource):
+        response_cache = {
+            'get_list': ResponseCache(
+                timeout=60, stale_timeout=600, vary_user=False,
+                vary_params=('city', 'limit', 'cursor')
+            ),
+            'get_element': ResponseCache(timeout=300),
+        }
+
+Responses are cached after encoding and compression, so a hit only copies
+stored bytes and headers. Entries are keyed by dispatch key, path, renderer,
+content encoding and Vary dimensions: query params (all by default), user
+with Authorization header (by default) and request headers.
+
+Hits don't reach handlers, so checks made by handlers and their decorators
+(`json_view_login_required`, permissions, API keys) are skipped. Everything
+a response depends on has to be in the key: with `vary_user=False` only
+requests without credentials are cached, and API keys passed in params or
+headers have to be listed in `vary_params` or `vary_headers`.
+
+For `stale_timeout` seconds after expiration the stale response is served
+while a single worker builds a fresh one in background.
+Only 200 responses without cookies and `Cache-Control: private/no-store`
+are cached. Conditional GET is answered from the stored ETag.
+"""
+import copy
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import get_cache
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.http import parse_http_date_safe
+
+from . import compression
+from . import conditional
+from .lru import LRUCache
+
+log = logging.getLogger(__name__)
+
+# Max number of responses kept in process by each cache
+RESPONSE_CACHE_SIZE = getattr(settings, 'REST_RESPONSE_CACHE_SIZE', 1024)
+
+# Larger bodies are not cached, in bytes
+RESPONSE_CACHE_MAX_ENTRY_SIZE = getattr(
+    settings, 'REST_RESPONSE_CACHE_MAX_ENTRY_SIZE', 1024 * 1024
+)
+
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+
+class CachedResponse(object):
+    def __init__(self, status_code, headers, content, generation=0,
+                 created=None, expires=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.generation = generation
+        self.created = time.time() if created is None else created
+        self.expires = expires
+
+    @classmethod
+    def from_response(cls, response, **kwargs):
+        """
+        Copy of the response or None when it can't be reused, for example
+        because it is streaming or sets cookies.
+        """
+        if getattr(response, 'streaming', False) or response.cookies:
+            return None
+        return cls(
+            response.status_code, response.items(), response.content,
+            **kwargs
+        )
+
+    def to_response(self):
+        response = HttpResponse(self.content, status=self.status_code)
+        for name, value in self.headers:
+            response[name] = value
+        return response
+
+
+def get_vary_headers(headers):
+    """
+    META keys of request header names.
+    """
+    return tuple(
+        'HTTP_' + header.upper().replace('-', '_') for header in headers
+    )
+
+
+def get_request_key_parts(request, dispatch_key, renderer, vary_params=None,
+                          vary_user=False, vary_headers=()):
+    parts = [
+        dispatch_key, request.path, renderer.format,
+        compression.accepts_gzip(request),
+    ]
+    if vary_params is None:
+        parts.append(sorted(request.GET.lists()))
+    else:
+        parts.extend(request.GET.getlist(name) for name in vary_params)
+    if vary_user:
+        user = getattr(request, 'user', None)
+        parts.append(
+            user.pk if user is not None and user.is_authenticated() else None
+        )
+        parts.append(request.META.get('HTTP_AUTHORIZATION'))
+    parts.extend(request.META.get(header) for header in vary_headers)
+    return parts
+
+
+def has_credentials(request):
+    """
+    True for requests of authenticated users and requests with
+    Authorization header.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated():
+        return True
+    return 'HTTP_AUTHORIZATION' in request.META
+
+
+def unconditional(request):
+    """
+    Copy of the request without conditional headers, so its response can
+    be shared with other requests.
+    """
+    request = copy.copy(request)
+    request.META = dict(request.META)
+    for header in CONDITIONAL_HEADERS:
+        request.META.pop(header, None)
+    return request
+
+
+def not_modified(request, headers):
+    """
+    304 response when request validators match validators in response
+    headers, None otherwise.
+    """
+    headers = dict(headers)
+    etag = headers.get('ETag')
+    last_modified = parse_http_date_safe(headers.get('Last-Modified', ''))
+    identity_etag = etag and etag.replace(compression.ETAG_SUFFIX, '')
+    if conditional.is_not_modified(request, identity_etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    return None
+
+
+class ResponseCache(object):
+
+    def __init__(self, timeout=60, stale_timeout=0, vary_params=None,
+                 vary_user=True, vary_headers=(), max_size=None,
+                 backend=None, name=None):
+        """
+        :param name: unique name of the cache, set by Resource when None
+        :param vary_params: names of query params, None for all of them
+        :param vary_user: key by user and Authorization header, when False
+            requests with credentials bypass the cache
+        :param vary_headers: request header names, like `Accept-Language`
+        :param backend: django cache alias shared by processes, optional
+        """
+        super(ResponseCache, self).__init__()
+        self.name = name
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+        self.vary_params = vary_params
+        self.vary_user = vary_user
+        self.vary_headers = get_vary_headers(vary_headers)
+        self.local = LRUCache(max_size or RESPONSE_CACHE_SIZE)
+        self.backend = get_cache(backend) if backend else None
+        self.generation = 0
+        self.revalidating = set()
+        self.lock = threading.Lock()
+
+    def make_key(self, *parts):
+        key = u':'.join([self.name] + [unicode(part) for part in parts])
+        return 'rest:response:' + hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    @property
+    def generation_key(self):
+        return self.make_key('generation')
+
+    def get_key(self, request, dispatch_key, renderer):
+        return self.make_key(*get_request_key_parts(
+            request, dispatch_key, renderer, self.vary_params, self.vary_user,
+            self.vary_headers
+        ))
+
+    def get_generation(self):
+        """
+        Generation of entries, shared by processes when backend is used.
+        """
+        if self.backend is None:
+            return self.generation
+        return self.backend.get(self.generation_key) or 0
+
+    def get(self, key):
+        entry = self.local.get(key)
+        if entry is not None:
+            if entry.generation == self.get_generation():
+                return entry
+            self.local.delete(key)
+
+        if self.backend is None:
+            return None
+
+        values = self.backend.get_many([key, self.generation_key])
+        entry = values.get(key)
+        if entry is not None and \
+                entry.generation == (values.get(self.generation_key) or 0):
+            self.local.set(key, entry)
+            return entry
+        return None
+
+    def set(self, key, entry):
+        entry.generation = self.get_generation()
+        self.local.set(key, entry)
+        if self.backend is not None:
+            self.backend.set(key, entry, self.timeout + self.stale_timeout)
+
+    def clear(self):
+        """
+        Drops all entries. With backend, entries kept by other processes
+        are dropped too, as local hits are checked against the generation
+        in the backend.
+        """
+        self.generation += 1
+        self.local.clear()
+        if self.backend is not None:
+            self.backend.add(self.generation_key, 0)
+            self.backend.incr(self.generation_key)
+
+    def is_cacheable(self, response):
+        if response.status_code != 200 or \
+                getattr(response, 'streaming', False):
+            return False
+        if len(response.content) > RESPONSE_CACHE_MAX_ENTRY_SIZE:
+            return False
+        cache_control = response.get('Cache-Control', '').lower()
+        return 'private' not in cache_control and \
+            'no-store' not in cache_control
+
+    def store(self, key, response):
+        if not self.is_cacheable(response):
+            return
+        entry = CachedResponse.from_response(
+            response, expires=time.time() + self.timeout
+        )
+        if entry is not None:
+            self.set(key, entry)
+
+    def build(self, key, request, respond):
+        """
+        Response for the request without conditional headers, stored when
+        cacheable.
+        """
+        response = respond(unconditional(request))
+        self.store(key, response)
+        return response
+
+    def revalidate(self, key, request, respond):
+        try:
+            self.build(key, request, respond)
+        except Exception as e:
+            log.exception(e.message, extra={
+                'request': request,
+            })
+        finally:
+            with self.lock:
+                self.revalidating.discard(key)
+            if self.backend is not None:
+                self.backend.delete(self.make_key('revalidating', key))
+
+    def start_revalidation(self, key, request, respond):
+        thread = threading.Thread(
+            target=self.revalidate_in_thread, args=(key, request, respond)
+        )
+        thread.daemon = True
+        thread.start()
+
+    def revalidate_in_thread(self, key, request, respond):
+        try:
+            self.revalidate(key, request, respond)
+        finally:
+            for connection in connections.all():
+                connection.close()
+
+    def acquire_revalidation(self, key):
+        """
+        True for a single worker, which has to revalidate the entry.
+        """
+        with self.lock:
+            if key in self.revalidating:
+                return False
+            self.revalidating.add(key)
+
+        if self.backend is not None and not self.backend.add(
+                self.make_key('revalidating', key), 1, self.timeout or 60):
+            with self.lock:
+                self.revalidating.discard(key)
+            return False
+        return True
+
+    def restore(self, request, entry):
+        response = not_modified(request, entry.headers) or \
+            entry.to_response()
+        response['Age'] = str(max(0, int(time.time() - entry.created)))
+        return response
+
+    def get_response(self, request, dispatch_key, renderer, respond):
+        """
+        Cached response or the one returned by `respond(request)`.
+        """
+        if request.method != 'GET' or \
+                not self.vary_user and has_credentials(request):
+            return respond(request)
+
+        key = self.get_key(request, dispatch_key, renderer)
+        entry = self.get(key)
+        now = time.time()
+        if entry is not None and entry.expires > now:
+            return self.restore(request, entry)
+
+        if entry is not None and entry.expires + self.stale_timeout > now:
+            if self.acquire_revalidation(key):
+                self.start_revalidation(key, request, respond)
+            return self.restore(request, entry)
+
+        response = self.build(key, request, respond)
+        if response.status_code == 200:
+            return not_modified(request, response.items()) or response
+        return response
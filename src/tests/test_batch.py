@@ -0,0 +1,123 @@
+import json
+import threading
+
+from django import test
+from django.http import HttpResponse
+from django.test.client import RequestFactory
+
+from .. import messagepack
+from ..api import Api
+from ..batch import BatchResource
+from ..resource import Resource
+from ..response import JsonResponse
+
+
+class HotelResource(Resource):
+
+    def __init__(self):
+        super(HotelResource, self).__init__()
+        self.names = ['A']
+        self.threads = set()
+
+    def read_list(self, request):
+        self.threads.add(threading.current_thread().name)
+        return JsonResponse({
+            'names': self.names, 'city': request.GET.getlist('city')
+        })
+
+    def read_element(self, request, identity):
+        self.threads.add(threading.current_thread().name)
+        return JsonResponse({'id': identity, 'path': request.path})
+
+    def create_list(self, request):
+        self.names = self.names + [json.loads(request.body)['name']]
+        return JsonResponse({'created': True}, status=201)
+
+    def update(self, request):
+        return HttpResponse('gone', content_type='text/plain')
+
+
+class BatchTest(test.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.hotels = HotelResource()
+        self.api = Api('v1', batch=True).register(hotels=self.hotels)
+        self.resource = BatchResource(self.api)
+
+    def post(self, items, **extra):
+        request = self.factory.post(
+            '/v1/batch', json.dumps(items), content_type='application/json',
+            **extra
+        )
+        return self.resource(request)
+
+    def test_batch(self):
+        resp = self.post([
+            {'resource': 'hotels', 'params': {'city': [1, 2]}},
+            {'resource': 'hotels', 'identity': 10},
+            {'method': 'post', 'resource': 'hotels', 'body': {'name': 'B'}},
+            {'resource': 'hotels'},
+            {'method': 'delete', 'resource': 'hotels', 'identity': 10},
+        ])
+        self.assertEqual(resp.status_code, 200)
+        data = json.loads(resp.content)
+
+        self.assertEqual(
+            [item['status'] for item in data['responses']],
+            [200, 200, 201, 200, 405]
+        )
+        bodies = [item['body'] for item in data['responses']]
+        self.assertEqual(bodies[0], {'names': ['A'], 'city': ['1', '2']})
+        self.assertEqual(bodies[1], {'id': '10', 'path': '/v1/hotels/10'})
+        self.assertEqual(bodies[3], {'names': ['A', 'B'], 'city': []})
+        self.assertEqual(bodies[4]['code'], 'E019')
+
+        for item in data['responses']:
+            self.assertGreaterEqual(item['time'], 0)
+        self.assertGreaterEqual(data['meta']['time'], 0)
+
+        # first two reads run on the pool, the last one alone
+        self.assertGreater(len(self.hotels.threads), 1)
+
+    def test_reads_after_write(self):
+        self.post([
+            {'method': 'post', 'resource': 'hotels', 'body': {'name': 'B'}},
+            {'resource': 'hotels'},
+            {'resource': 'hotels', 'identity': 10},
+        ])
+        # pool threads don't see writes of the request thread's transaction
+        self.assertEqual(
+            self.hotels.threads, {threading.current_thread().name}
+        )
+
+    def test_non_json_body(self):
+        resp = self.post([{'method': 'put', 'resource': 'hotels'}])
+        body = json.loads(resp.content)['responses'][0]['body']
+        self.assertEqual(body, 'gone')
+
+    def test_msgpack(self):
+        resp = self.post(
+            [{'resource': 'hotels', 'identity': 'x'}],
+            HTTP_ACCEPT='application/x-msgpack'
+        )
+        self.assertEqual(resp['Content-Type'], 'application/x-msgpack')
+        self.assertEqual(
+            messagepack.unpackb(resp.content)['responses'][0]['body'],
+            {'id': 'x', 'path': '/v1/hotels/x'}
+        )
+
+    def test_invalid(self):
+        for items in ([], {}, [1], [{'resource': 'rooms'}],
+                      [{'resource': 'hotels', 'method': 'TRACE'}],
+                      [{'resource': 'hotels', 'params': [1]}],
+                      [{'resource': 'hotels'}] * 51):
+            resp = self.post(items)
+            self.assertEqual(resp.status_code, 400)
+            self.assertEqual(json.loads(resp.content)['code'], 'E018')
+
+    def test_url(self):
+        self.assertIn('api_v1_batch', [url.name for url in self.api.urls])
+        self.assertNotIn(
+            'api_v1_batch', [url.name for url in Api('v1').urls]
+        )
@@ -0,0 +1,43 @@
+import datetime
+
+from django import test
+
+from .. import dateformat
+
+
+class DateFormatTest(test.TestCase):
+
+    def assertSameAsFormat(self, fmt, value):
+        expected = fmt.format(value)
+        result = dateformat.compile_formatter(fmt)(value)
+        self.assertEqual(result, expected)
+        self.assertEqual(type(result), type(expected))
+
+    def test_compiled_formats(self):
+        values = [
+            datetime.datetime(2014, 12, 1, 9, 5, 7, 300),
+            datetime.date(2014, 12, 1),
+            datetime.time(9, 5, 7),
+        ]
+        for fmt in (u'{:%Y-%m-%d}', '{:%Y-%m-%dT%H-%M-%S}', u'{:%H:%M}',
+                    u'{0:%d.%m.%Y} 100%', '{}', u'{:%Y %b}'):
+            for value in values:
+                self.assertSameAsFormat(fmt, value)
+
+    def test_fallback(self):
+        formatter = dateformat.compile_formatter(u'{:%Y-%m-%d}')
+        self.assertRaises(ValueError, formatter, datetime.date(1899, 1, 1))
+        self.assertRaises(ValueError, formatter, 'text')
+        self.assertEqual(
+            dateformat.compile_formatter(u'{:%b}'), u'{:%b}'.format
+        )
+
+    def test_shared_formatters(self):
+        self.assertIs(
+            dateformat.get_formatter(u'{:%H:%M}'),
+            dateformat.get_formatter(u'{:%H:%M}')
+        )
+        self.assertIsNot(
+            dateformat.get_formatter(u'{:%H:%M}'),
+            dateformat.get_formatter('{:%H:%M}')
+        )
@@ -1,3 +1,5 @@
+import array
+
 from django import test
 
 from .. import forms
@@ -10,6 +12,12 @@ class FormForTest(forms.Form):
 
 class FormTest(test.TestCase):
 
+    def test_declaration_order(self):
+        self.assertEqual(
+            FormForTest.base_fields.keys(), ['user', 'password']
+        )
+        self.assertFalse(hasattr(FormForTest.base_fields['user'], '__dict__'))
+
     def test_basic_validation(self):
         form = FormForTest(data={})
         self.assertFalse(form.is_valid())
@@ -271,6 +279,20 @@ class FormTest(test.TestCase):
             F(data={'wow': 'asdasd'}).is_valid()
         )
 
+    def test_float_array_field(self):
+        class F(forms.Form):
+            wow = forms.FloatArrayField(required=True, output='array')
+
+        f = F(data={'wow': "[1.5, 3]"})
+        self.assertTrue(f.is_valid())
+        self.assertEqual(f.cleaned_data['wow'], array.array('d', [1.5, 3]))
+
+        f = F(data={'wow': array.array('l', [1, 2])})
+        self.assertTrue(f.is_valid())
+        self.assertEqual(f.cleaned_data['wow'], array.array('d', [1, 2]))
+
+        self.assertFalse(F(data={'wow': '1,x'}).is_valid())
+
     def test_dict_array_field(self):
         class Villain(forms.Form):
             name = forms.CharField()
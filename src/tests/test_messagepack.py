@@ -0,0 +1,96 @@
+import datetime
+from decimal import Decimal
+
+from django import test
+from django.test.client import RequestFactory
+
+from .. import messagepack
+from .. import negotiation
+from .. import params
+from ..resource import Resource
+from ..response import JsonResponse
+
+
+class MessagePackTest(test.TestCase):
+
+    def test_round_trip(self):
+        values = [
+            None, True, False, 0, 127, 128, -1, -32, -33, -129, 255, 256,
+            65536, 2 ** 32, 2 ** 63, -2 ** 31 - 1, -2 ** 63, 1.5,
+            u'', u'\u0436' * 40, 'a' * 300, u'b' * 70000,
+            [], range(20), range(70000), {},
+            dict((str(i), i) for i in range(20)),
+            {'nested': [{'a': [1, {'b': None}]}]},
+        ]
+        for value in values:
+            packed = messagepack.packb_python(value)
+            self.assertEqual(messagepack.unpackb_python(packed), value)
+
+    def test_registered_types(self):
+        packed = messagepack.packb_python({
+            'price': Decimal('10.555'),
+            'day': datetime.date(2014, 12, 1),
+            'tags': (1, 2),
+            'unknown': object(),
+        })
+        self.assertEqual(
+            messagepack.unpackb_python(packed),
+            {'price': 10.56, 'day': u'2014-12-01', 'tags': [1, 2],
+             'unknown': None}
+        )
+
+    def test_invalid_data(self):
+        for data in ('', '\xc1', '\x92\x01', '\x01\x02', '\xa5abc'):
+            self.assertRaises(
+                messagepack.UnpackException, messagepack.unpackb_python, data
+            )
+
+
+class ItemsResource(Resource):
+
+    def read_list(self, request):
+        return JsonResponse([{'id': 1, 'name': u'item'}])
+
+    def create_list(self, request):
+        return JsonResponse(params.request_body(request), status=201)
+
+
+class NegotiationTest(test.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_select_renderer(self):
+        def select(header):
+            return negotiation.select_renderer(
+                self.factory.get('/', HTTP_ACCEPT=header)
+            )
+
+        self.assertIs(select('application/x-msgpack'), negotiation.MSGPACK)
+        self.assertIs(
+            select('application/json;q=0.5, application/msgpack'),
+            negotiation.MSGPACK
+        )
+        self.assertIs(select('*/*'), negotiation.JSON)
+        self.assertIs(
+            select('application/json, application/x-msgpack'),
+            negotiation.JSON
+        )
+
+    def test_resource(self):
+        resource = ItemsResource()
+        resp = resource(
+            self.factory.get('/items', HTTP_ACCEPT='application/x-msgpack')
+        )
+        self.assertEqual(resp['Content-Type'], 'application/x-msgpack')
+        self.assertEqual(
+            messagepack.unpackb(resp.content), [{'id': 1, 'name': u'item'}]
+        )
+
+        resp = resource(self.factory.post(
+            '/items', messagepack.packb({'name': u'new'}),
+            content_type='application/x-msgpack'
+        ))
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp['Content-Type'], 'application/json')
+        self.assertEqual(resp.content, '{"name": "new"}')
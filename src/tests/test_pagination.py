@@ -0,0 +1,87 @@
+from django import test
+from django.test.client import RequestFactory
+
+from .. import pagination
+from ..errors import UserDefinedApiException
+from .test_preparers import City, Country, create_tables
+
+
+class KeysetPaginatorTest(test.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(KeysetPaginatorTest, cls).setUpClass()
+        create_tables(Country, City)
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        country = Country.objects.create(name='C')
+        for population in (5, 3, 5, 1, 3, 5, 2):
+            City.objects.create(
+                name='c{}'.format(population), population=population,
+                country=country
+            )
+        self.expected = list(
+            City.objects.order_by('-population', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def get_page(self, paginator, url):
+        return paginator.paginate(self.factory.get(url), City.objects.all())
+
+    def test_walk_forward_and_back(self):
+        paginator = pagination.KeysetPaginator(
+            ordering=('-population', ), limit=3
+        )
+        pages = []
+        page = self.get_page(paginator, '/cities?limit=3')
+        self.assertIsNone(page.meta['prev'])
+        while True:
+            pages.append([city.pk for city in page.objects])
+            if page.meta['next'] is None:
+                break
+            page = self.get_page(paginator, page.meta['next'])
+
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+
+        back = self.get_page(paginator, page.meta['prev'])
+        self.assertEqual([city.pk for city in back.objects], pages[1])
+        back = self.get_page(paginator, back.meta['prev'])
+        self.assertEqual([city.pk for city in back.objects], pages[0])
+        self.assertIsNone(back.meta['prev'])
+        self.assertIsNotNone(back.meta['next'])
+
+    def test_limit(self):
+        paginator = pagination.KeysetPaginator(limit=2, max_limit=4)
+        self.assertEqual(len(self.get_page(paginator, '/').objects), 2)
+        self.assertEqual(
+            len(self.get_page(paginator, '/?limit=100').objects), 4
+        )
+        self.assertEqual(
+            len(self.get_page(paginator, '/?limit=x').objects), 2
+        )
+
+    def test_invalid_cursor(self):
+        paginator = pagination.KeysetPaginator()
+        for cursor in ('x', 'WyJuIixbXV0', 'WyJ6IixbIjEiXV0'):
+            with self.assertRaises(UserDefinedApiException) as cm:
+                self.get_page(paginator, '/?cursor=' + cursor)
+            self.assertEqual(cm.exception.response.status_code, 400)
+
+    def test_count(self):
+        page = self.get_page(pagination.KeysetPaginator(), '/')
+        self.assertNotIn('count', page.meta)
+
+        page = self.get_page(pagination.KeysetPaginator(count='exact'), '/')
+        self.assertEqual(page.meta['count'], 7)
+
+        paginator = pagination.KeysetPaginator(count='estimated')
+        self.assertEqual(self.get_page(paginator, '/').meta['count'], 7)
+        City.objects.create(
+            name='c0', population=0, country=Country.objects.get()
+        )
+        # sqlite has no planner estimate, count is cached instead
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_page(paginator, '/').meta['count'], 7)
@@ -0,0 +1,949 @@
+import array
+import datetime
+import json
+from decimal import Decimal
+
+from django import test
+from django.core.management.color import no_style
+from django.db import connection, models
+
+from .. import preparers
+from .. import response
+
+
+class Obj(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class AddressPreparer(preparers.Preparer):
+    city = preparers.CharField()
+    zip = preparers.NullIntField(src='zip_code')
+
+
+class HotelPreparer(preparers.Preparer):
+    id = preparers.IntField()
+    name = preparers.CharField()
+    stars = preparers.NullIntField()
+    rating = preparers.FloatField(src='info.rating')
+    price = preparers.DecimalField(trg='prices.base')
+    enabled = preparers.BooleanField(src='is_enabled')
+    opened = preparers.DateField()
+    title = preparers.Field(src='get_title')
+    address = preparers.RelatedInstanceField(serializer=AddressPreparer())
+    tags = preparers.Field(default=[])
+
+
+def make_hotel(**kwargs):
+    data = dict(
+        id='1',
+        name='Grand',
+        stars=None,
+        info=Obj(rating='4.5'),
+        price='10.50',
+        is_enabled=1,
+        opened=datetime.date(2014, 12, 1),
+        get_title=lambda: 'Grand hotel',
+        address=Obj(city='Moscow', zip_code=None),
+        tags=None,
+    )
+    data.update(kwargs)
+    return Obj(**data)
+
+
+def interpret(preparer, obj):
+    res = {}
+    for rule in preparer.rules:
+        rule.get_value_from_context_and_set_to_result(obj, res)
+    return res
+
+
+class PreparerTest(test.TestCase):
+
+    def test_compiled_output_matches_rules(self):
+        preparer = HotelPreparer()
+        hotel = make_hotel()
+
+        self.assertDictEqual(
+            preparer(hotel),
+            interpret(preparer, hotel)
+        )
+        self.assertDictEqual(
+            preparer(hotel),
+            {
+                'id': 1,
+                'name': u'Grand',
+                'stars': None,
+                'rating': 4.5,
+                'prices': {'base': Decimal('10.50')},
+                'enabled': True,
+                'opened': u'2014-12-01',
+                'title': 'Grand hotel',
+                'address': {'city': u'Moscow', 'zip': None},
+                'tags': [],
+            }
+        )
+
+    def test_dict_source(self):
+        class P(preparers.Preparer):
+            id = preparers.IntField()
+            city = preparers.CharField(src='address.city')
+
+        data = {'id': 5, 'address': {'city': 'Paris'}}
+        self.assertDictEqual(P()(data), {'id': 5, 'city': u'Paris'})
+
+    def test_context(self):
+        class P(preparers.Preparer):
+            city = preparers.CharField()
+
+            class Meta:
+                default_context = 'address'
+
+        self.assertDictEqual(
+            P()(make_hotel()),
+            {'city': u'Moscow'}
+        )
+
+    def test_missing_attribute_raises(self):
+        class P(preparers.Preparer):
+            missing = preparers.IntField()
+
+        with self.assertRaises(AttributeError):
+            P()(make_hotel())
+
+    def test_conversion_error_raises(self):
+        with self.assertRaises(ValueError):
+            HotelPreparer()(make_hotel(id='one'))
+
+    def test_plan_is_reused(self):
+        self.assertIs(HotelPreparer().plan, HotelPreparer().plan)
+
+    def test_contexts_do_not_change_class_rules(self):
+        class P(preparers.Preparer):
+            city = preparers.CharField()
+
+        data = {'city': 'Moscow', 'address': {'city': 'Paris'}}
+        in_address = P(context='address')
+        default = P()
+
+        self.assertEqual(in_address(data), {'city': u'Paris'})
+        self.assertEqual(default(data), {'city': u'Moscow'})
+        self.assertIsNone(P._rules[0].context)
+        self.assertIs(P(context='address').plan, in_address.plan)
+
+    def test_custom_hooks_are_called(self):
+        class UpperField(preparers.Field):
+            def set_value(self, res, value):
+                res[self.trg.upper()] = value
+
+        class CustomField(preparers.Field):
+            def get_value_from_context_and_set_to_result(self, obj, res):
+                res[self.trg] = 'x'
+
+        class P(preparers.Preparer):
+            a = UpperField()
+            b = preparers.IntField()
+            custom = CustomField()
+
+        data = [{'a': 1, 'b': '2'}, {'a': 3, 'b': 4}]
+        self.assertEqual(P()(data[0]), interpret(P(), data[0]))
+        self.assertEqual(P()(data[0]), {'A': 1, 'b': 2, 'custom': 'x'})
+        self.assertEqual(P().prepare_many(data), map(P(), data))
+        self.assertEqual(P().prepare_rows(data), map(P(), data))
+
+    def test_subclass_does_not_change_base_rules(self):
+        class Base(preparers.Preparer):
+            id = preparers.IntField()
+
+        class Child(Base):
+            name = preparers.CharField()
+
+        self.assertEqual(Base()({'id': 1, 'name': 'x'}), {'id': 1})
+        self.assertEqual(
+            Child()({'id': 1, 'name': 'x'}),
+            {'id': 1, 'name': u'x'}
+        )
+
+
+class AccessorTest(test.TestCase):
+
+    def test_mixed_sources_on_same_path(self):
+        accessor = preparers.Accessor('address.city')
+
+        self.assertEqual(accessor({'address': {'city': 'Rome'}}), 'Rome')
+        self.assertEqual(accessor(make_hotel()), 'Moscow')
+        self.assertEqual(accessor({'address': Obj(city='Oslo')}), 'Oslo')
+
+    def test_interpreted_rule_with_mixed_sources(self):
+        preparer = HotelPreparer()
+        rule = [r for r in preparer.rules if r.trg == 'rating'][0]
+
+        res = {}
+        rule.get_value_from_context_and_set_to_result(
+            {'info': {'rating': 3}}, res
+        )
+        rule.get_value_from_context_and_set_to_result(make_hotel(), res)
+        self.assertEqual(res, {'rating': 4.5})
+
+    def test_cache_is_bounded(self):
+        cache = preparers.AccessorCache(max_size=2)
+        for path in ('a', 'b', 'c'):
+            cache.getter(dict, path)
+        cache.getter(dict, 'c')
+
+        self.assertDictEqual(
+            cache.stats(),
+            {'hits': 1, 'misses': 3, 'evictions': 1, 'size': 2, 'max_size': 2}
+        )
+
+
+class PrepareManyTest(test.TestCase):
+
+    def test_matches_single_object_output(self):
+        preparer = HotelPreparer()
+        hotels = [
+            make_hotel(id=i, stars=i % 2 or None, price=i)
+            for i in range(300)
+        ]
+
+        self.assertEqual(
+            preparer.prepare_many(iter(hotels)),
+            [preparer(h) for h in hotels]
+        )
+
+    def test_flat_rules(self):
+        class P(preparers.Preparer):
+            id = preparers.IntField()
+            rating = preparers.FloatField(src='info.rating')
+            zip = preparers.NullIntField(src='address.zip_code')
+
+        hotels = [make_hotel(id=i) for i in range(300)]
+        self.assertEqual(
+            P().prepare_many(hotels),
+            [P()(h) for h in hotels]
+        )
+
+    def test_overridden_get_value_is_respected(self):
+        class DoubleIntField(preparers.IntField):
+            def get_value(self, context):
+                return int(context) * 2
+
+        class P(preparers.Preparer):
+            id = DoubleIntField()
+
+        self.assertEqual(
+            P().prepare_many([{'id': 1}, {'id': '2'}]),
+            [{'id': 2}, {'id': 4}]
+        )
+
+    def test_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            HotelPreparer().prepare_many([make_hotel(), make_hotel(id='x')])
+
+    def test_nested_iterable(self):
+        class P(preparers.Preparer):
+            addresses = preparers.RelatedIterableField(
+                serializer=AddressPreparer()
+            )
+
+        hotel = Obj(addresses=[Obj(city='A', zip_code=1), Obj(city='B', zip_code=None)])
+        self.assertEqual(
+            P()(hotel),
+            {'addresses': [{'city': u'A', 'zip': 1}, {'city': u'B', 'zip': None}]}
+        )
+
+
+class Country(models.Model):
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        app_label = 'rest'
+
+
+class City(models.Model):
+    name = models.CharField(max_length=100)
+    population = models.IntegerField()
+    country = models.ForeignKey(Country)
+
+    class Meta:
+        app_label = 'rest'
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        app_label = 'rest'
+
+
+class Hotel(models.Model):
+    name = models.CharField(max_length=100)
+    status = models.IntegerField(choices=((1, 'open'), (2, 'closed')))
+    description = models.TextField()
+    city = models.ForeignKey(City)
+    tags = models.ManyToManyField(Tag)
+
+    class Meta:
+        app_label = 'rest'
+
+
+class Room(models.Model):
+    name = models.CharField(max_length=100)
+    hotel = models.ForeignKey(Hotel, related_name='rooms')
+    tags = models.ManyToManyField(Tag)
+
+    class Meta:
+        app_label = 'rest'
+
+
+class QueryPlanTest(test.TestCase):
+
+    def get_plan(self, preparer):
+        return preparer.get_query_plan(Hotel)
+
+    def test_related_lookups(self):
+        class TagPreparer(preparers.Preparer):
+            name = preparers.CharField()
+
+        class RoomPreparer(preparers.Preparer):
+            name = preparers.CharField()
+            tags = preparers.RelatedIterableField(serializer=TagPreparer())
+
+        class CityPreparer(preparers.Preparer):
+            name = preparers.CharField()
+            country = preparers.CharField(src='country.name')
+
+        class P(preparers.Preparer):
+            id = preparers.IntField()
+            name = preparers.CharField()
+            status = preparers.DjangoDisplayPropertyField(src='self')
+            city = preparers.RelatedInstanceField(serializer=CityPreparer())
+            rooms = preparers.RelatedIterableField(serializer=RoomPreparer())
+
+        plan = self.get_plan(P())
+        self.assertEqual(
+            plan.select_related,
+            set(['city', 'city__country'])
+        )
+        self.assertEqual(
+            plan.prefetch_related,
+            set(['rooms', 'rooms__tags'])
+        )
+        self.assertEqual(
+            plan.only,
+            set([
+                'id', 'name', 'status', 'city', 'city__name',
+                'city__country', 'city__country__name',
+            ])
+        )
+
+        queryset = P().optimize_queryset(Hotel.objects.all())
+        self.assertEqual(
+            queryset.query.select_related,
+            {'city': {'country': {}}}
+        )
+        self.assertEqual(
+            sorted(queryset._prefetch_related_lookups),
+            ['rooms', 'rooms__tags']
+        )
+
+    def test_context_and_properties(self):
+        class P(preparers.Preparer):
+            name = preparers.CharField()
+            title = preparers.CharField(src='get_title')
+
+            class Meta:
+                default_context = 'city'
+
+        plan = self.get_plan(P())
+        self.assertEqual(plan.select_related, set(['city']))
+        self.assertIn('city__population', plan.only)
+        self.assertIn('city__country', plan.only)
+        self.assertNotIn('description', plan.only)
+
+
+class PreparedCacheTest(test.TestCase):
+
+    def setUp(self):
+        class CountryPreparer(preparers.Preparer):
+            name = preparers.CharField()
+
+            class Meta:
+                cache = True
+
+        class CityPreparer(preparers.Preparer):
+            name = preparers.CharField()
+            population = preparers.IntField()
+            country = preparers.RelatedInstanceField(
+                serializer=CountryPreparer()
+            )
+
+            class Meta:
+                cache = True
+
+        self.preparer = CityPreparer()
+        self.country = Country(pk=1, name='France')
+        self.city = City(pk=1, name='Paris', population=1, country=self.country)
+
+    def save(self, instance):
+        models.signals.post_save.send(sender=type(instance), instance=instance)
+
+    def test_cached_until_saved(self):
+        self.assertEqual(self.preparer(self.city)['population'], 1)
+
+        self.city.population = 2
+        self.assertEqual(self.preparer(self.city)['population'], 1)
+
+        self.save(self.city)
+        self.assertEqual(self.preparer(self.city)['population'], 2)
+
+    def test_child_change_invalidates_parent(self):
+        other = City(pk=2, name='Lyon', population=1, country=self.country)
+        self.preparer(self.city)
+        self.preparer(other)
+
+        self.country.name = 'Republic of France'
+        self.save(self.country)
+
+        self.assertEqual(
+            self.preparer(self.city)['country'],
+            {'name': u'Republic of France'}
+        )
+        self.assertEqual(
+            self.preparer(other)['country'],
+            {'name': u'Republic of France'}
+        )
+
+    def test_projection_prepared_first(self):
+        self.preparer.project('name')(self.city)
+        self.preparer(self.city)
+
+        self.country.name = 'Republic of France'
+        self.save(self.country)
+        self.assertEqual(
+            self.preparer(self.city)['country'],
+            {'name': u'Republic of France'}
+        )
+
+    def test_evicted_keys_are_forgotten(self):
+        cache = preparers.cache.PreparedCache(type(self.preparer), max_size=2)
+        for pk in range(1, 6):
+            city = City(
+                pk=pk, name='City', population=pk, country=self.country
+            )
+            cache.get_or_prepare(self.preparer, city)
+        self.assertEqual(len(cache.local), 2)
+        # two remaining cities and their country
+        self.assertEqual(len(cache.dependents), 3)
+        self.assertEqual(
+            set.union(*cache.dependents.values()), set(cache.local._data)
+        )
+
+    def test_invalidation_in_other_process(self):
+        caches = [
+            preparers.cache.PreparedCache(
+                type(self.preparer), backend='default'
+            )
+            for _ in range(2)
+        ]
+        identity = preparers.cache.get_identity(self.city)
+
+        def prepare(cache):
+            return cache.get_or_prepare(self.preparer, self.city)['population']
+
+        self.assertEqual(prepare(caches[0]), 1)
+        self.assertEqual(prepare(caches[1]), 1)
+
+        self.city.population = 2
+        caches[0].invalidate(identity)
+        self.assertEqual(prepare(caches[1]), 2)
+
+        self.city.population = 3
+        caches[0].invalidate_all()
+        self.assertEqual(prepare(caches[1]), 3)
+
+    def test_meta_model_connects_eagerly(self):
+        class P(preparers.Preparer):
+            name = preparers.CharField()
+            country = preparers.CharField(src='country.name')
+
+            class Meta:
+                cache = True
+                model = City
+
+        cache = P().cache
+        receivers = preparers.cache._receivers
+        # nothing prepared yet, saves in this process invalidate entries
+        # prepared by other processes
+        self.assertIs(receivers[City][cache], True)
+        self.assertIs(receivers[Country][cache], False)
+
+    def test_not_model_instances_are_not_cached(self):
+        data = {'name': 'Rome', 'population': 3, 'country': {'name': 'Italy'}}
+        self.assertEqual(self.preparer(data)['population'], 3)
+        data['population'] = 4
+        self.assertEqual(self.preparer(data)['population'], 4)
+
+
+class ProjectionTest(test.TestCase):
+
+    def test_projected_output(self):
+        preparer = HotelPreparer().project('id, address.city,prices')
+
+        self.assertEqual(
+            preparer(make_hotel()),
+            {'id': 1, 'address': {'city': u'Moscow'}, 'prices': {'base': Decimal('10.50')}}
+        )
+        self.assertEqual(
+            preparer.prepare_many([make_hotel()]),
+            [preparer(make_hotel())]
+        )
+
+    def test_projections_are_cached(self):
+        preparer = HotelPreparer()
+        self.assertIs(
+            preparer.project('name,id'),
+            preparer.project(['id', 'name'])
+        )
+        self.assertIs(preparer.project(''), preparer)
+
+    def test_unknown_fields_are_ignored(self):
+        preparer = HotelPreparer()
+        projected = preparer.project('id,address.city')
+        for fields in ('id,address.city,x', 'id,address.city,id.x,address.y',
+                       'id,address.city,prices.base.x'):
+            self.assertIs(preparer.project(fields), projected)
+
+        self.assertEqual(
+            preparer.project('prices.base,prices.x')(make_hotel()),
+            {'prices': {'base': Decimal('10.50')}}
+        )
+        self.assertEqual(preparer.project('x,y')(make_hotel()), {})
+
+    def test_projections_are_bounded(self):
+        class P(HotelPreparer):
+            pass
+
+        preparer = P()
+        for index in range(preparers.settings.PROJECTION_CACHE_SIZE + 10):
+            preparer.project('id,unknown{}'.format(index))
+        self.assertEqual(len(preparer.plan.projections), 1)
+
+        # 128 distinct sets of fields
+        paths = ['id', 'name', 'stars', 'rating', 'prices', 'enabled',
+                 'opened']
+        for index in range(2 ** len(paths)):
+            preparer.project([
+                path for bit, path in enumerate(paths) if index & 1 << bit
+            ])
+        self.assertEqual(
+            len(preparer.plan.projections),
+            preparers.settings.PROJECTION_CACHE_SIZE
+        )
+
+    def test_original_is_not_changed(self):
+        preparer = HotelPreparer()
+        preparer.project('address.zip')
+
+        self.assertEqual(
+            preparer(make_hotel())['address'],
+            {'city': u'Moscow', 'zip': None}
+        )
+
+    def test_only_uses_projected_columns(self):
+        class P(preparers.Preparer):
+            id = preparers.IntField()
+            name = preparers.CharField()
+            description = preparers.CharField()
+            city = preparers.CharField(src='city.name')
+
+        plan = P().project('id,city').get_query_plan(Hotel)
+        self.assertEqual(plan.only, set(['id', 'city', 'city__name']))
+
+
+class CountryNamePreparer(preparers.Preparer):
+    name = preparers.CharField()
+
+
+_created_tables = set()
+
+
+def create_tables(*models_to_create):
+    cursor = connection.cursor()
+    for model in models_to_create:
+        if model in _created_tables:
+            continue
+        through_models = [
+            field.rel.through for field in model._meta.many_to_many
+        ]
+        for table_model in [model] + through_models:
+            sql, _ = connection.creation.sql_create_model(
+                table_model, no_style()
+            )
+            for statement in sql:
+                cursor.execute(statement)
+        _created_tables.add(model)
+
+
+class ValuesPlanTest(test.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(ValuesPlanTest, cls).setUpClass()
+        create_tables(Country, City)
+
+    def test_plain_columns(self):
+        class P(preparers.Preparer):
+            id = preparers.IntField()
+            name = preparers.CharField()
+            country = preparers.CharField(src='country.name')
+            country_id = preparers.IntField()
+
+        france = Country.objects.create(name='France')
+        City.objects.create(name='Paris', population=2, country=france)
+        City.objects.create(name='Lyon', population=1, country=france)
+
+        preparer = P()
+        queryset = City.objects.order_by('name')
+        self.assertEqual(
+            preparer.get_values_plan(City).lookups,
+            ['country', 'country__name', 'id', 'name']
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                preparer.prepare_values(queryset),
+                [
+                    {'id': 2, 'name': u'Lyon', 'country': u'France', 'country_id': 1},
+                    {'id': 1, 'name': u'Paris', 'country': u'France', 'country_id': 1},
+                ]
+            )
+        self.assertEqual(
+            preparer.prepare_values(queryset),
+            preparer.prepare_many(queryset)
+        )
+
+    def test_instances_are_required(self):
+        class P(preparers.Preparer):
+            name = preparers.CharField()
+            title = preparers.CharField(src='get_title')
+
+        class Related(preparers.Preparer):
+            country = preparers.RelatedInstanceField(
+                serializer=CountryNamePreparer()
+            )
+
+        self.assertIsNone(P().get_values_plan(City))
+        self.assertIsNone(Related().get_values_plan(City))
+
+
+class DistinctTest(test.TestCase):
+
+    def get_preparer(self, distinct):
+        class P(preparers.Preparer):
+            cities = preparers.RelatedIterableField(
+                serializer=CountryNamePreparer(), distinct=distinct
+            )
+        return P()
+
+    def test_distinct_by_path_keeps_order(self):
+        cities = [{'name': n} for n in ('b', 'a', 'b', 'c', 'a')]
+        self.assertEqual(
+            self.get_preparer('name')({'cities': cities}),
+            {'cities': [{'name': u'b'}, {'name': u'a'}, {'name': u'c'}]}
+        )
+
+    def test_duplicates_are_not_serialized(self):
+        calls = []
+
+        def key(item):
+            calls.append(item)
+            return preparers.Accessor('name')(item).lower()
+
+        cities = [Obj(name='A'), {'name': 'a'}, Obj(name='B')]
+        self.assertEqual(
+            self.get_preparer(key)({'cities': cities}),
+            {'cities': [{'name': u'A'}, {'name': u'B'}]}
+        )
+        self.assertEqual(len(calls), 3)
+
+    def test_distinct_objects(self):
+        paris = Obj(name='Paris')
+        self.assertEqual(
+            self.get_preparer(True)({'cities': [paris, paris]}),
+            {'cities': [{'name': u'Paris'}]}
+        )
+
+    def test_distinct_values(self):
+        class P(preparers.Preparer):
+            cities = preparers.RelatedIterableField(
+                src='items', serializer=lambda o: o['city'], distinct=True
+            )
+
+        items = [{'city': 'b'}, {'city': 'a'}, {'city': 'b', 'id': 2}]
+        self.assertEqual(P()({'items': items}), {'cities': ['b', 'a']})
+
+        hotels = [make_hotel(), make_hotel(), make_hotel(id='2')]
+        self.assertEqual(
+            self.get_preparer(True)({'cities': hotels}),
+            {'cities': [{'name': u'Grand'}]}
+        )
+
+    def test_distinct_in_database(self):
+        create_tables(Country)
+        Country.objects.create(name='France')
+
+        processor = preparers.RelatedIterableField(
+            serializer=CountryNamePreparer(), distinct=True
+        ).get_distinct_processor()
+        queryset = Country.objects.all()
+
+        self.assertTrue(processor.can_distinct_in_database(queryset))
+        self.assertEqual(processor(queryset), [{'name': u'France'}])
+
+        list(queryset)
+        self.assertFalse(processor.can_distinct_in_database(queryset))
+        self.assertEqual(processor(queryset), [{'name': u'France'}])
+
+
+class ParallelTest(test.TestCase):
+
+    def test_split_pks(self):
+        self.assertEqual(
+            preparers.parallel.split_pks([1, 2, 5, 7, 8, 10, 11], 3),
+            [(1, 5), (7, 10), (11, 11)]
+        )
+        self.assertEqual(preparers.parallel.split_pks([], 3), [])
+
+    def test_prepare_shard(self):
+        create_tables(Country)
+        for name in ('a', 'b', 'c', 'd'):
+            Country.objects.create(name=name)
+
+        queryset = Country.objects.filter(name__in=['a', 'c', 'd'])
+        pks = list(queryset.values_list('pk', flat=True))
+        chunk = preparers.parallel.prepare_shard((
+            CountryNamePreparer, None, None, Country, queryset.query, [],
+            pks[0], pks[1]
+        ))
+        self.assertEqual(chunk, '{"name": "a"}, {"name": "c"}')
+
+    def test_sliced_queryset(self):
+        with self.assertRaises(ValueError):
+            CountryNamePreparer().prepare_parallel_json(
+                Country.objects.all()[:10], 2
+            )
+
+    def test_inherited_connections_kept(self):
+        inherited = preparers.parallel._inherited_connections
+        connection.cursor()
+        parent_connection = connection.connection
+        try:
+            preparers.parallel.drop_connections()
+            self.assertIsNone(connection.connection)
+            self.assertIs(inherited[-1], parent_connection)
+        finally:
+            connection.connection = parent_connection
+            del inherited[:]
+
+
+class ProfilingTest(test.TestCase):
+
+    def test_nested_rules_roll_up(self):
+        preparer = HotelPreparer()
+        hotels = [make_hotel(), make_hotel(id='2')]
+        reports = []
+
+        with preparers.profiling.Profile(hook=reports.append) as profile:
+            result = preparer.prepare_many(hotels)
+            preparer(make_hotel())
+
+        self.assertEqual(result, map(preparer, hotels))
+        self.assertEqual(reports, [profile])
+
+        rules = dict(
+            (item['trg'], item) for item in profile.as_dict()
+        )
+        self.assertEqual(rules['id']['preparer'], 'HotelPreparer')
+        self.assertEqual(rules['id']['calls'], 3)
+        self.assertEqual(rules['prices.base']['calls'], 3)
+
+        nested = dict(
+            (item['trg'], item) for item in rules['address']['rules']
+        )
+        self.assertEqual(nested['zip']['preparer'], 'AddressPreparer')
+        self.assertEqual(nested['zip']['calls'], 3)
+
+        totals = profile.as_list()
+        self.assertEqual(len(totals), 12)
+        self.assertTrue(totals[0]['time'] >= totals[-1]['time'])
+
+    def test_errors_are_counted(self):
+        preparer = HotelPreparer()
+
+        with preparers.profiling.Profile() as profile:
+            self.assertRaises(
+                ValueError, preparer.prepare_many, [make_hotel(id='x')]
+            )
+
+        rules = dict(
+            (item['trg'], item) for item in profile.as_dict()
+        )
+        self.assertEqual(rules['id']['errors'], 1)
+        self.assertEqual(rules['id']['calls'], 1)
+
+    def test_compiled_rules_are_measured(self):
+        preparer = HotelPreparer()
+        hotel = make_hotel()
+        expected = preparer(hotel)
+
+        def interpreted(*args):
+            raise AssertionError('interpreted path is used')
+
+        Field = preparers.fields.Field
+        original = Field.get_value_from_context_and_set_to_result
+        Field.get_value_from_context_and_set_to_result = interpreted
+        try:
+            with preparers.profiling.Profile() as profile:
+                result = preparer(hotel)
+        finally:
+            Field.get_value_from_context_and_set_to_result = original
+
+        self.assertEqual(result, expected)
+        rules = dict(
+            (item['trg'], item) for item in profile.as_dict()
+        )
+        self.assertEqual(rules['id']['calls'], 1)
+
+    def test_disabled_outside_of_profile(self):
+        with preparers.profiling.Profile():
+            pass
+        self.assertEqual(preparers.profiling.enabled, 0)
+        self.assertIsNone(preparers.profiling.get_profile())
+
+
+class RowsTest(test.TestCase):
+
+    def test_fields_have_no_dict(self):
+        for rule in HotelPreparer._rules:
+            self.assertFalse(hasattr(rule, '__dict__'))
+
+    def test_rows_match_prepare_many(self):
+        preparer = HotelPreparer()
+        hotels = [make_hotel(), make_hotel(id='2', tags=['a'])]
+
+        rows = preparer.prepare_rows(hotels)
+        self.assertIsInstance(rows, preparers.Rows)
+        self.assertEqual(len(rows), 2)
+        self.assertIsInstance(rows.rows[0], tuple)
+        self.assertEqual(list(rows), preparer.prepare_many(hotels))
+        self.assertEqual(rows[1], preparer(hotels[1]))
+        self.assertEqual(rows[1:].expand(), [preparer(hotels[1])])
+
+    def test_flat_rows(self):
+        rows = CountryNamePreparer().prepare_rows([Obj(name='a')])
+        self.assertEqual(rows.keys, ('name', ))
+        self.assertEqual(rows.rows, [(u'a', )])
+        self.assertEqual(rows.expand(), [{'name': u'a'}])
+
+
+class ArrayFieldTest(test.TestCase):
+
+    def test_outputs(self):
+        class PricesPreparer(preparers.Preparer):
+            prices = preparers.FloatArrayField()
+            nights = preparers.IntArrayField(output='array')
+            calendar = preparers.FloatArrayField(output='numpy')
+
+        result = PricesPreparer()(Obj(
+            prices=['1.5', 2], nights=array.array('d', [1, 2]),
+            calendar=(3, 4.5)
+        ))
+        self.assertEqual(result['prices'], [1.5, 2.0])
+        self.assertEqual(result['nights'], array.array('l', [1, 2]))
+        self.assertEqual(list(result['calendar']), [3.0, 4.5])
+        self.assertEqual(
+            json.loads(response.JsonResponse(result).content),
+            {'prices': [1.5, 2.0], 'nights': [1, 2], 'calendar': [3.0, 4.5]}
+        )
+
+
+class RelationInvalidationTest(test.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(RelationInvalidationTest, cls).setUpClass()
+        create_tables(Country, City, Tag, Hotel)
+
+    def setUp(self):
+        class CityPreparer(preparers.Preparer):
+            name = preparers.CharField()
+
+            class Meta:
+                cache = True
+
+        class CountryPreparer(preparers.Preparer):
+            name = preparers.CharField()
+            cities = preparers.RelatedIterableField(
+                src='city_set', serializer=CityPreparer()
+            )
+
+            class Meta:
+                cache = True
+
+        class TagPreparer(preparers.Preparer):
+            name = preparers.CharField()
+
+            class Meta:
+                cache = True
+
+        class HotelTagsPreparer(preparers.Preparer):
+            name = preparers.CharField()
+            tags = preparers.RelatedIterableField(serializer=TagPreparer())
+
+            class Meta:
+                cache = True
+
+        self.country_preparer = CountryPreparer()
+        self.hotel_preparer = HotelTagsPreparer()
+        self.france = Country.objects.create(name='France')
+        self.italy = Country.objects.create(name='Italy')
+        self.paris = City.objects.create(
+            name='Paris', population=1, country=self.france
+        )
+
+    def get_cities(self, country):
+        country = Country.objects.get(pk=country.pk)
+        return [c['name'] for c in self.country_preparer(country)['cities']]
+
+    def test_created_child(self):
+        self.assertEqual(self.get_cities(self.france), [u'Paris'])
+        City.objects.create(name='Lyon', population=1, country=self.france)
+        self.assertEqual(self.get_cities(self.france), [u'Paris', u'Lyon'])
+
+    def test_moved_child(self):
+        self.assertEqual(self.get_cities(self.france), [u'Paris'])
+        self.assertEqual(self.get_cities(self.italy), [])
+
+        self.paris.country = self.italy
+        self.paris.save()
+        self.assertEqual(self.get_cities(self.france), [])
+        self.assertEqual(self.get_cities(self.italy), [u'Paris'])
+
+    def test_m2m(self):
+        hotel = Hotel.objects.create(
+            name='Ritz', status=1, description='', city=self.paris
+        )
+        tag = Tag.objects.create(name='spa')
+
+        def get_tags():
+            return self.hotel_preparer(Hotel.objects.get(pk=hotel.pk))['tags']
+
+        self.assertEqual(get_tags(), [])
+        hotel.tags.add(tag)
+        self.assertEqual(get_tags(), [{'name': u'spa'}])
+        tag.hotel_set.remove(hotel)
+        self.assertEqual(get_tags(), [])
+        hotel.tags.add(tag)
+        self.assertEqual(len(get_tags()), 1)
+        hotel.tags.clear()
+        self.assertEqual(get_tags(), [])
@@ -0,0 +1,454 @@
+import datetime
+import json
+import threading
+import time
+import zlib
+
+from django import test
+from django.test.client import RequestFactory
+
+from .. import compression
+from .. import negotiation
+from ..coalescing import SingleFlight
+from ..response_cache import CachedResponse, ResponseCache
+from ..resource import Resource
+from ..response import JsonResponse, StreamingJsonResponse
+from .test_response import ItemPreparer
+
+
+class VersionedResource(Resource):
+    updated_at = datetime.datetime(2014, 12, 1, 10, 0)
+
+    def __init__(self):
+        super(VersionedResource, self).__init__()
+        self.reads = 0
+
+    def get_element_version(self, request, identity):
+        return self.updated_at
+
+    def read_element(self, request, identity):
+        self.reads += 1
+        return JsonResponse({'id': identity})
+
+    def read_list(self, request):
+        self.reads += 1
+        return JsonResponse([1, 2])
+
+
+class ConditionalGetTest(test.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.resource = VersionedResource()
+
+    def test_version_etag(self):
+        resp = self.resource(self.factory.get('/hotels/1'), identity='1')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['ETag'].startswith('W/"'))
+        self.assertEqual(resp['Last-Modified'], 'Mon, 01 Dec 2014 10:00:00 GMT')
+
+        resp = self.resource(
+            self.factory.get('/hotels/1', HTTP_IF_NONE_MATCH=resp['ETag']),
+            identity='1'
+        )
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.resource.reads, 1)
+
+        resp = self.resource(
+            self.factory.get(
+                '/hotels/1',
+                HTTP_IF_MODIFIED_SINCE='Mon, 01 Dec 2014 10:00:00 GMT'
+            ),
+            identity='1'
+        )
+        self.assertEqual(resp.status_code, 304)
+
+        self.resource.updated_at = datetime.datetime(2014, 12, 2)
+        resp = self.resource(
+            self.factory.get('/hotels/1', HTTP_IF_NONE_MATCH=resp['ETag']),
+            identity='1'
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.resource.reads, 2)
+
+    def test_body_etag(self):
+        resp = self.resource(self.factory.get('/hotels'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp['ETag'].startswith('W/'))
+        self.assertFalse(resp.has_header('Last-Modified'))
+
+        resp = self.resource(
+            self.factory.get('/hotels', HTTP_IF_NONE_MATCH=resp['ETag'])
+        )
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, '')
+
+
+class BigResource(Resource):
+
+    def read_list(self, request):
+        return JsonResponse([{'id': i, 'name': 'hotel'} for i in range(500)])
+
+    def read_element(self, request, identity):
+        return StreamingJsonResponse(
+            [{'id': i, 'name': 'room'} for i in range(100)], ItemPreparer(),
+            chunk_size=10
+        )
+
+
+class CompressionTest(test.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.resource = BigResource()
+
+    def test_negotiation(self):
+        def accepts(header):
+            return compression.accepts_gzip(
+                self.factory.get('/', HTTP_ACCEPT_ENCODING=header)
+            )
+
+        self.assertTrue(accepts('gzip, deflate'))
+        self.assertTrue(accepts('*'))
+        self.assertFalse(accepts('gzip;q=0, *'))
+        self.assertFalse(accepts(''))
+
+    def test_compressed_once(self):
+        plain = self.resource(self.factory.get('/hotels'))
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(plain['Vary'], 'Accept, Accept-Encoding')
+
+        request = self.factory.get('/hotels', HTTP_ACCEPT_ENCODING='gzip')
+        resp = self.resource(request)
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertTrue(resp['ETag'].endswith(';gzip"'))
+        self.assertEqual(
+            zlib.decompress(resp.content, compression.GZIP_WBITS),
+            plain.content
+        )
+
+        hits = compression.compressed_cache.hits
+        self.assertEqual(self.resource(request).content, resp.content)
+        self.assertEqual(compression.compressed_cache.hits, hits + 1)
+
+        resp = self.resource(self.factory.get(
+            '/hotels', HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=resp['ETag']
+        ))
+        self.assertEqual(resp.status_code, 304)
+
+    def test_shared_etag(self):
+        request = self.factory.get('/hotels', HTTP_ACCEPT_ENCODING='gzip')
+        for name in ('first', 'second'):
+            content = json.dumps([{'id': i, 'user': name} for i in range(200)])
+            resp = JsonResponse(content)
+            resp['ETag'] = '"same-version"'
+            resp = compression.compress_response(request, resp)
+            self.assertEqual(
+                zlib.decompress(resp.content, compression.GZIP_WBITS),
+                content
+            )
+
+    def test_streaming(self):
+        resp = self.resource(
+            self.factory.get('/hotels/1', HTTP_ACCEPT_ENCODING='gzip'),
+            identity='1'
+        )
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        content = zlib.decompress(
+            ''.join(resp.streaming_content), compression.GZIP_WBITS
+        )
+        self.assertEqual(len(json.loads(content)['objects']), 100)
+
+
+class DeferredResponseCache(ResponseCache):
+
+    def __init__(self, *args, **kwargs):
+        super(DeferredResponseCache, self).__init__(*args, **kwargs)
+        self.pending = []
+
+    def start_revalidation(self, key, request, respond):
+        self.pending.append((key, request, respond))
+
+    def run_pending(self):
+        while self.pending:
+            self.revalidate(*self.pending.pop())
+
+
+class CachedResource(Resource):
+
+    def __init__(self):
+        super(CachedResource, self).__init__()
+        self.reads = 0
+        self.response_cache = {
+            'get_list': DeferredResponseCache(
+                timeout=60, vary_params=('city', )
+            ),
+            'get_element': DeferredResponseCache(
+                timeout=0, stale_timeout=60, vary_user=False
+            ),
+        }
+
+    def read_list(self, request):
+        self.reads += 1
+        if request.GET.get('city') == 'none':
+            return JsonResponse({'error': 'city'}, status=400)
+        return JsonResponse(
+            [{'id': i, 'city': request.GET.get('city')} for i in range(200)]
+        )
+
+    def read_element(self, request, identity):
+        self.reads += 1
+        return JsonResponse({'id': identity, 'reads': self.reads})
+
+
+class ResponseCacheTest(test.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.resource = CachedResource()
+
+    def test_hit(self):
+        first = self.resource(self.factory.get('/hotels?city=1&page=1'))
+        second = self.resource(self.factory.get('/hotels?page=2&city=1'))
+        self.assertEqual(self.resource.reads, 1)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second['Age'], '0')
+
+        self.resource(self.factory.get('/hotels?city=2'))
+        self.assertEqual(self.resource.reads, 2)
+
+        self.resource.response_cache['get_list'].clear()
+        self.resource(self.factory.get('/hotels?city=1'))
+        self.assertEqual(self.resource.reads, 3)
+
+    def test_compressed(self):
+        request = self.factory.get('/hotels', HTTP_ACCEPT_ENCODING='gzip')
+        first = self.resource(request)
+        second = self.resource(request)
+        self.assertEqual(self.resource.reads, 1)
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(second.content, first.content)
+
+        plain = self.resource(self.factory.get('/hotels'))
+        self.assertEqual(self.resource.reads, 2)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+    def test_not_modified(self):
+        etag = self.resource(self.factory.get('/hotels'))['ETag']
+        for _ in range(2):
+            resp = self.resource(
+                self.factory.get('/hotels', HTTP_IF_NONE_MATCH=etag)
+            )
+            self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.resource.reads, 1)
+
+    def test_errors_not_cached(self):
+        for _ in range(2):
+            resp = self.resource(self.factory.get('/hotels?city=none'))
+            self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self.resource.reads, 2)
+
+    def test_clear_in_other_process(self):
+        caches = [
+            ResponseCache(backend='default', name='shared') for _ in range(2)
+        ]
+        request = self.factory.get('/hotels')
+        key = caches[0].get_key(request, 'get_list', negotiation.JSON)
+        caches[0].set(key, CachedResponse(200, [], '[]'))
+        self.assertIsNotNone(caches[1].get(key))
+
+        caches[0].clear()
+        self.assertIsNone(caches[1].get(key))
+
+    def test_credentials(self):
+        class User(object):
+            def __init__(self, pk):
+                self.pk = pk
+
+            def is_authenticated(self):
+                return True
+
+        def get(user=None, **extra):
+            request = self.factory.get('/hotels/1', **extra)
+            if user is not None:
+                request.user = user
+            return self.resource(request, '1')
+
+        # shared cache is bypassed by requests with credentials
+        cache = self.resource.response_cache['get_element']
+        self.assertFalse(cache.vary_user)
+        get()
+        get(User(1))
+        get(HTTP_AUTHORIZATION='Token a')
+        self.assertEqual(self.resource.reads, 3)
+        self.assertEqual(len(cache.pending), 0)
+
+        # by default entries are kept per user
+        self.assertTrue(ResponseCache().vary_user)
+        self.resource.response_cache['get_element'] = DeferredResponseCache(
+            timeout=60
+        )
+        get(User(1))
+        get(User(1))
+        get(User(2))
+        get(HTTP_AUTHORIZATION='Token a')
+        get(HTTP_AUTHORIZATION='Token a')
+        self.assertEqual(self.resource.reads, 6)
+
+    def test_stale_while_revalidate(self):
+        cache = self.resource.response_cache['get_element']
+        request = self.factory.get('/hotels/1')
+        self.assertEqual(json.loads(self.resource(request, '1').content), {
+            'id': '1', 'reads': 1
+        })
+
+        for _ in range(2):
+            resp = self.resource(request, '1')
+            self.assertEqual(json.loads(resp.content)['reads'], 1)
+        self.assertEqual(len(cache.pending), 1)
+
+        cache.run_pending()
+        resp = self.resource(request, '1')
+        self.assertEqual(json.loads(resp.content)['reads'], 2)
+
+
+class SlowResource(Resource):
+
+    def __init__(self):
+        super(SlowResource, self).__init__()
+        self.reads = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.single_flight = {
+            'get_list': SingleFlight(backend='default', poll_interval=0.01),
+        }
+
+    def read_list(self, request):
+        self.reads += 1
+        self.started.set()
+        self.release.wait(5)
+        return JsonResponse({'reads': self.reads})
+
+
+class SingleFlightTest(test.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.resource = SlowResource()
+
+    def test_concurrent_requests(self):
+        responses = []
+
+        def get(url):
+            responses.append(self.resource(self.factory.get(url)))
+
+        threads = [
+            threading.Thread(target=get, args=('/hotels?city=1', ))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        self.resource.started.wait(5)
+        time.sleep(0.05)
+        self.resource.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.resource.reads, 1)
+        self.assertEqual(
+            set(json.loads(resp.content)['reads'] for resp in responses),
+            set([1])
+        )
+
+        self.resource(self.factory.get('/hotels?city=1'))
+        self.assertEqual(self.resource.reads, 2)
+
+    def test_other_process(self):
+        # another process with its own flights, sharing the backend
+        other = SlowResource()
+        self.resource.release.set()
+        responses = []
+
+        def get(resource):
+            responses.append(resource(self.factory.get('/hotels')))
+
+        leader = threading.Thread(target=get, args=(other, ))
+        leader.start()
+        other.started.wait(5)
+        waiter = threading.Thread(target=get, args=(self.resource, ))
+        waiter.start()
+        time.sleep(0.05)
+        other.release.set()
+        leader.join(5)
+        waiter.join(5)
+
+        self.assertEqual(other.reads, 1)
+        self.assertEqual(self.resource.reads, 0)
+        self.assertEqual(
+            [json.loads(resp.content) for resp in responses],
+            [{'reads': 1}] * 2
+        )
+
+        # result of a finished flight is not reused
+        get(self.resource)
+        self.assertEqual(self.resource.reads, 1)
+
+
+class PartialResource(Resource):
+
+    def read_element(self, request, identity):
+        return JsonResponse({'id': identity})
+
+    def update_element(self, request, identity):
+        raise NotImplementedError()
+
+
+class DispatchTableTest(test.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.resource = PartialResource()
+
+    def test_table(self):
+        self.assertEqual(Resource.dispatch_table, {})
+        self.assertEqual(PartialResource.dispatch_table, {
+            ('GET', True): ('get_element', 'read_element'),
+            ('HEAD', True): ('get_element', 'read_element'),
+            ('PUT', True): ('put_element', 'update_element'),
+        })
+        self.assertEqual(
+            PartialResource.allowed_methods,
+            {True: 'GET, HEAD, PUT', False: ''}
+        )
+
+    def test_method_not_allowed(self):
+        for _ in range(2):
+            resp = self.resource(self.factory.delete('/hotels/1'), '1')
+            self.assertEqual(resp.status_code, 405)
+            self.assertEqual(resp['Allow'], 'GET, HEAD, PUT')
+            self.assertEqual(json.loads(resp.content)['code'], 'E019')
+
+        resp = self.resource(self.factory.delete(
+            '/hotels/1', HTTP_ACCEPT='application/x-msgpack'
+        ), '1')
+        self.assertEqual(resp.status_code, 405)
+        self.assertEqual(resp['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(resp.content)['code'], 'E019')
+
+        resp = self.resource(self.factory.options('/hotels'))
+        self.assertEqual(resp.status_code, 405)
+        self.assertEqual(resp['Allow'], '')
+
+        resp = self.resource(self.factory.get('/hotels/1'), '1')
+        self.assertEqual(json.loads(resp.content), {'id': '1'})
+
+        resp = self.resource(self.factory.head('/hotels/1'), '1')
+        self.assertEqual(resp.status_code, 200)
+        resp = self.resource(self.factory.head('/hotels'))
+        self.assertEqual(resp.status_code, 405)
+
+        # handlers raising NotImplementedError are still reported as 501
+        resp = self.resource(self.factory.put('/hotels/1'), '1')
+        self.assertEqual(resp.status_code, 501)
@@ -0,0 +1,143 @@
+import datetime
+import json
+from decimal import Decimal
+
+from django import test
+
+from .. import default_error_responses
+from .. import encoders
+from .. import preparers
+from .. import response
+
+
+class ItemPreparer(preparers.Preparer):
+    id = preparers.IntField()
+    name = preparers.CharField()
+
+
+class StreamingJsonResponseTest(test.TestCase):
+
+    def get_content(self, resp):
+        return json.loads(''.join(resp.streaming_content))
+
+    def test_envelope(self):
+        items = [{'id': i, 'name': 'item'} for i in range(7)]
+        resp = response.StreamingJsonResponse(
+            items, ItemPreparer(), chunk_size=3
+        )
+
+        self.assertEqual(resp['Content-Type'], 'application/json')
+        self.assertEqual(
+            self.get_content(resp),
+            {
+                'objects': [{'id': i, 'name': 'item'} for i in range(7)],
+                'meta': {'page': 1, 'count': 7, 'limit': 7},
+            }
+        )
+
+    def test_empty(self):
+        resp = response.StreamingJsonResponse([], ItemPreparer())
+        self.assertEqual(
+            self.get_content(resp),
+            {'objects': [], 'meta': {'page': 1, 'count': 0, 'limit': 0}}
+        )
+
+
+class JsonResponseTest(test.TestCase):
+
+    def test_rows_are_expanded(self):
+        rows = ItemPreparer().prepare_rows([{'id': 1, 'name': 'item'}])
+        resp = response.JsonResponseWithMetadata(rows)
+        self.assertEqual(
+            json.loads(resp.content),
+            {
+                'objects': [{'id': 1, 'name': 'item'}],
+                'meta': {'page': 1, 'count': 1, 'limit': 1},
+            }
+        )
+
+
+class EncoderTest(test.TestCase):
+
+    def test_registered_types(self):
+        class Day(datetime.date):
+            pass
+
+        self.assertEqual(
+            json.loads(encoders.dumps({
+                'price': Decimal('10.555'),
+                'day': Day(2014, 12, 1),
+                'at': datetime.datetime(2014, 12, 1, 9, 5, 7),
+                'time': datetime.time(9, 5),
+                'tags': set(['a']),
+                'unknown': object(),
+            })),
+            {
+                'price': 10.56,
+                'day': '2014-12-01',
+                'at': '2014-12-01T09-05-07',
+                'time': '09:05:00',
+                'tags': ['a'],
+                'unknown': None,
+            }
+        )
+
+    def test_register(self):
+        class Money(object):
+            def __init__(self, amount):
+                self.amount = amount
+
+        class Rub(Money):
+            pass
+
+        registry = encoders.TypeRegistry()
+        registry.register(Money, lambda v: v.amount)
+        encoder = encoders.Encoder(backend='json', default=registry)
+        self.assertEqual(encoder.dumps([Rub(5)]), '[5]')
+        self.assertEqual(encoders.Encoder().dumps([Rub(5)]), '[null]')
+
+
+class ErrorResponseTest(test.TestCase):
+
+    def encode(self, code, message, params):
+        # body as it was built before templates
+        if 'errors' in params:
+            errors = [
+                {'message': message.format(**error), 'meta': error}
+                for error in params['errors']
+            ]
+        else:
+            errors = [{'message': message.format(**params), 'meta': params}]
+        return json.dumps(
+            {'errors': errors, 'code': code},
+            default=response.default_callback
+        )
+
+    def test_same_body_as_dumps(self):
+        message = u'Parameter {parameter!r} is "invalid". {message:>5} \u2603'
+        template = response.ErrorTemplate('T001', message, 400)
+        for params in [
+            {'parameter': u'na"me\n', 'message': u'\u0436'},
+            {'parameter': 5, 'message': 'x', 'extra': Decimal('1.5')},
+            {'errors': [
+                {'parameter': 'a', 'message': 'b'},
+                {'parameter': 'c', 'message': 'd'},
+            ]},
+        ]:
+            self.assertEqual(
+                template.render(params), self.encode('T001', message, params)
+            )
+        self.assertRaises(KeyError, template.render, {'parameter': 1})
+
+    def test_static_body(self):
+        template = response.ErrorTemplate('T002', u'Update is empty', 400)
+        body = template.render({})
+        self.assertEqual(body, self.encode('T002', u'Update is empty', {}))
+        self.assertIs(template.render({}), body)
+
+        resp = default_error_responses.EmptyRequestResponse()
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(
+            json.loads(resp.content)['errors'][0]['message'],
+            'Update is empty'
+        )